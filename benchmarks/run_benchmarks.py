@@ -0,0 +1,169 @@
+"""
+Benchmarks for EIGENTOOLS on synthetic PackedAncestryMap datasets.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scales small medium] [--output results.json]
+                                        [--baseline baseline.json] [--threshold 0.25]
+
+Results are written as JSON, mapping every scale to the best wall time in seconds of every benchmark. When a
+baseline is given, any benchmark slower than the baseline by more than the threshold is reported as a regression
+and the script exits with status 1.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from EIGENTOOLS import (SNP_Info, Ind_Info, PackedAncestryMap,
+                        PackedAncestryMapWriter, extract, write_synthetic)
+from EIGENTOOLS._read import hash_list
+
+
+# (number of individuals, number of SNPs)
+SCALES = {
+    "small": (100, 2000),
+    "medium": (1000, 20000),
+    "large": (5000, 100000),
+}
+
+
+def bench_iterate(prefix: str) -> None:
+    for _ in PackedAncestryMap(file_prefix=prefix, check_hash=False):
+        pass
+
+
+def bench_goto_snp(prefix: str) -> None:
+    reader = PackedAncestryMap(file_prefix=prefix, check_hash=False)
+    rnd = random.Random(0)
+    names = reader.snp_info.var_name
+    for _ in range(1000):
+        reader.goto_snp(rnd.choice(names))
+    reader.close()
+
+
+def bench_metadata(prefix: str) -> None:
+    SNP_Info(prefix + ".snp")
+    Ind_Info(prefix + ".ind")
+
+
+def bench_hash(prefix: str) -> None:
+    hash_list(SNP_Info(prefix + ".snp").var_name)
+
+
+def bench_write(prefix: str) -> None:
+    snp_info = SNP_Info(prefix + ".snp")
+    ind_info = Ind_Info(prefix + ".ind")
+    dosages = [[0, 1, 2, float("nan")][i % 4] for i in range(len(ind_info))]
+    writer = PackedAncestryMapWriter(snp_info, ind_info, file_prefix=prefix + "_write")
+    writer.write_records(dosages for _ in range(len(snp_info)))
+    writer.close()
+
+
+def bench_extract(prefix: str) -> None:
+    reader = PackedAncestryMap(file_prefix=prefix, check_hash=False)
+    n_snp = len(reader.snp_info)
+    extract(reader, list(range(0, n_snp, 2)), {"POP1", "POP3"},
+            file_prefix=prefix + "_extract")
+    reader.close()
+
+
+BENCHMARKS = {
+    "iterate": bench_iterate,
+    "goto_snp": bench_goto_snp,
+    "metadata": bench_metadata,
+    "hash": bench_hash,
+    "write": bench_write,
+    "extract": bench_extract,
+}
+
+
+def run(scales: list[str], repeat: int, workdir: str) -> dict:
+    """
+    Runs every benchmark at every scale
+
+    Args:
+        scales (list): Names of the scales to run
+        repeat (int): Number of times each benchmark is run. The best time is kept
+        workdir (str): Directory receiving the synthetic datasets
+
+    Returns:
+        dict: Best wall time in seconds of every benchmark at every scale
+    """
+    results = {}
+    for scale in scales:
+        n_ind, n_snp = SCALES[scale]
+        prefix = os.path.join(workdir, scale)
+        write_synthetic(prefix, n_ind, n_snp, seed=0)
+        results[scale] = {}
+        for name, func in BENCHMARKS.items():
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(prefix)
+                times.append(time.perf_counter() - start)
+            results[scale][name] = min(times)
+            print("%-8s %-10s %10.4f s" % (scale, name, min(times)), file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares results against a baseline
+
+    Args:
+        results (dict): Results of the current run
+        baseline (dict): Results of a previous run
+        threshold (float): Allowed relative slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        list: Description of every regression
+    """
+    regressions = []
+    for scale, timings in results.items():
+        for name, seconds in timings.items():
+            try:
+                reference = baseline[scale][name]
+            except KeyError:
+                continue
+            if seconds > reference * (1 + threshold):
+                regressions.append("%s/%s: %.4f s vs baseline %.4f s (+%.0f%%)" %
+                                   (scale, name, seconds, reference,
+                                    100 * (seconds / reference - 1)))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["small", "medium"],
+                        choices=list(SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file receiving the results")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative slowdown before a regression is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.scales, args.repeat, workdir)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,6 +23,7 @@ setup(
     package_dir={"": "src"},
     packages=find_packages(where="src"),
     python_requires=">=3.11",
+    extras_require={"numpy": ["numpy"]},
     project_urls={
         "Bug Reports": "https://github.com/floutt/EIGENTOOLS/issues",
         "Source": "https://github.com/floutt/EIGENTOOLS",
@@ -1,2 +1,10 @@
 from EIGENTOOLS._read import SNP_Info, Ind_Info, PackedAncestryMap
 from EIGENTOOLS._write import PackedAncestryMapWriter
+from EIGENTOOLS._merge import concatenate, merge_individuals
+from EIGENTOOLS._extract import extract
+from EIGENTOOLS._synthetic import write_synthetic
+from EIGENTOOLS._popstats import PopulationStats, population_stats
+from EIGENTOOLS._transpose import TransposedAncestryMap, TransposedAncestryMapWriter, transpose
+from EIGENTOOLS._plink import to_bed, from_bed
+from EIGENTOOLS._compress import compress_geno, decompress_geno
+from EIGENTOOLS._pairwise import pairwise
@@ -0,0 +1,154 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+
+CACHE_SUFFIX = ".eigcache"
+_MAGIC = b"EIGCACHE\x01" + (b"<" if sys.byteorder == "little" else b">")
+# source size, source mtime (ns), source digest, number of rows, hash
+_HEADER = struct.Struct("=QQ16sQQ")
+_SECTION = struct.Struct("=Q")
+
+
+def _file_digest(filename: str) -> bytes:
+    """
+    Computes the content digest of a file
+
+    Args:
+        filename (str): File to digest
+
+    Returns:
+        bytes: 16-byte BLAKE2b digest of the file contents
+    """
+    with open(filename, "rb") as f:
+        return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).digest()
+
+
+def _encode_strings(values: list[str]) -> bytes:
+    """
+    Encodes a list of whitespace-free strings as a single newline separated blob
+
+    Args:
+        values (list): Strings to encode
+
+    Returns:
+        bytes: Encoded strings
+    """
+    return "\n".join(values).encode()
+
+
+def _decode_strings(blob: bytes, n_rows: int) -> list[str]:
+    """
+    Decodes a blob created by "_encode_strings"
+
+    Args:
+        blob (bytes): Encoded strings
+        n_rows (int): Number of strings encoded in "blob"
+
+    Returns:
+        list: Decoded strings
+    """
+    return blob.decode().split("\n") if n_rows else []
+
+
+def _encode_column(values, kind: str) -> list[bytes]:
+    """
+    Encodes a column into one or more sections
+
+    Args:
+        values (list | array): Column to encode
+        kind (str): Either "str" for a list of strings, "cat" for a dictionary-encoded list of strings, or an array typecode
+
+    Returns:
+        list: Encoded sections
+    """
+    if kind == "str":
+        return [_encode_strings(values)]
+    if kind == "cat":
+        levels = {}
+        codes = array("I", [levels.setdefault(v, len(levels)) for v in values])
+        return [_encode_strings(list(levels)), codes.tobytes()]
+    return [array(kind, values).tobytes()]
+
+
+def write_cache(obj, filename: str, columns: tuple) -> None:
+    """
+    Writes the parsed columns and hash of a metadata object to "<filename>.eigcache". Failures to write are ignored
+
+    Args:
+        obj (SNP_Info | Ind_Info): Parsed metadata object
+        filename (str): Location of the text file "obj" was parsed from
+        columns (tuple): Pairs of attribute name and column kind, see "_encode_column"
+    """
+    stat = os.stat(filename)
+    sections = []
+    for attr, kind in columns:
+        sections.extend(_encode_column(getattr(obj, attr), kind))
+    cache_file = filename + CACHE_SUFFIX
+    tmp_file = "%s.%i.tmp" % (cache_file, os.getpid())
+    try:
+        with open(tmp_file, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_HEADER.pack(stat.st_size, stat.st_mtime_ns,
+                                 _file_digest(filename), len(obj), obj._hash))
+            for section in sections:
+                f.write(_SECTION.pack(len(section)))
+                f.write(section)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def load_cache(obj, filename: str, columns: tuple) -> bool:
+    """
+    Loads the columns and hash of a metadata object from "<filename>.eigcache" if the cache is valid.
+    The cache is valid if the size, modification time and content digest of "filename" match those stored in it
+
+    Args:
+        obj (SNP_Info | Ind_Info): Metadata object to populate
+        filename (str): Location of the text file the cache was built from
+        columns (tuple): Pairs of attribute name and column kind, see "_encode_column"
+
+    Returns:
+        bool: True if the cache was valid and "obj" was populated
+    """
+    cache_file = filename + CACHE_SUFFIX
+    try:
+        stat = os.stat(filename)
+        with open(cache_file, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(_MAGIC)] != _MAGIC:
+                return False
+            size, mtime, digest, n_rows, hash_value = _HEADER.unpack_from(mm, len(_MAGIC))
+            if (size, mtime) != (stat.st_size, stat.st_mtime_ns) or digest != _file_digest(filename):
+                return False
+            offset = len(_MAGIC) + _HEADER.size
+
+            def next_section() -> bytes:
+                nonlocal offset
+                (length,) = _SECTION.unpack_from(mm, offset)
+                offset += _SECTION.size + length
+                return mm[offset - length:offset]
+
+            values = {}
+            for attr, kind in columns:
+                if kind == "str":
+                    values[attr] = _decode_strings(next_section(), n_rows)
+                elif kind == "cat":
+                    levels = _decode_strings(next_section(), n_rows)
+                    codes = array("I")
+                    codes.frombytes(next_section())
+                    values[attr] = list(map(levels.__getitem__, codes))
+                else:
+                    values[attr] = array(kind)
+                    values[attr].frombytes(next_section())
+    except (OSError, ValueError, struct.error):
+        return False
+    for attr, value in values.items():
+        setattr(obj, attr, value)
+    obj._hash_value = hash_value
+    return True
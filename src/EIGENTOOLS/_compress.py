@@ -0,0 +1,370 @@
+import lzma
+import os
+import struct
+import zlib
+
+
+COMPRESSED_MAGIC = b"EIGZGENO\x01"
+CODECS = ("zlib", "lzma")
+# codec, records per block, record size, number of records, offset of the block index
+_LAYOUT = struct.Struct("<BIIQQ")
+_PREAMBLE_SIZE = len(COMPRESSED_MAGIC) + _LAYOUT.size
+_COPY_SIZE = 1 << 24
+
+
+def _compress_block(data: bytes, codec: str, level: (int | None)) -> bytes:
+    """
+    Compresses a block of records
+
+    Args:
+        data (bytes): Records to compress
+        codec (str): Either "zlib" or "lzma"
+        level (int, optional): Compression level, or preset for "lzma". Defaults to the codec's default
+
+    Returns:
+        bytes: Compressed block
+    """
+    if codec == "zlib":
+        return zlib.compress(data, -1 if level is None else level)
+    return lzma.compress(data, preset=level)
+
+
+def _decompress_block(data: bytes, codec: str) -> bytes:
+    """
+    Decompresses a block compressed by "_compress_block"
+
+    Args:
+        data (bytes): Compressed block
+        codec (str): Either "zlib" or "lzma"
+
+    Returns:
+        bytes: Records of the block
+    """
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return lzma.decompress(data)
+
+
+def is_compressed(filename: str) -> bool:
+    """
+    Checks whether a ".geno" file is a block-compressed container
+
+    Args:
+        filename (str): Location of the ".geno" file
+
+    Returns:
+        bool: True if the file starts with the magic number of compressed containers
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(COMPRESSED_MAGIC)) == COMPRESSED_MAGIC
+
+
+class _BlockCompressor:
+    """
+    Splits a stream of fixed-size records into blocks of "block_records" records and compresses each block independently.
+    A compressed container holds a preamble (magic number and layout), the uncompressed header record, the compressed
+    blocks, and an index of the file offset of every block followed by the offset of the index itself.
+
+    Attributes:
+        codec (str): Either "zlib" or "lzma"
+        level (int | None): Compression level. None for the codec's default
+        block_records (int): Number of records per block
+        recordsize (int): Size of individual record in bytes
+        offsets (list): File offset of every block written so far, followed by the offset after the last block
+        _pending (bytearray): Records not yet compressed
+    """
+    def __init__(self, codec: str, level: (int | None), block_records: int,
+                 recordsize: int) -> None:
+        """
+        Initializes _BlockCompressor object.
+
+        Args:
+            codec (str): Either "zlib" or "lzma"
+            level (int, optional): Compression level. Defaults to the codec's default
+            block_records (int): Number of records per block
+            recordsize (int): Size of individual record in bytes
+        """
+        if codec not in CODECS:
+            raise ValueError("Compression must either be \"zlib\" or \"lzma\".")
+        if block_records < 1:
+            raise ValueError("Blocks must hold at least one record.")
+        self.codec = codec
+        self.level = level
+        self.block_records = block_records
+        self.recordsize = recordsize
+        self.offsets = [_PREAMBLE_SIZE + recordsize]
+        self._pending = bytearray()
+
+    def preamble(self, n_records: int, index_offset: int = 0) -> bytes:
+        """
+        Builds the preamble of the container
+
+        Args:
+            n_records (int): Number of records, excluding the header record
+            index_offset (int): File offset of the block index. Unknown, and left as 0, until all blocks are written
+
+        Returns:
+            bytes: Magic number and layout
+        """
+        return COMPRESSED_MAGIC + _LAYOUT.pack(CODECS.index(self.codec), self.block_records,
+                                               self.recordsize, n_records, index_offset)
+
+    def _flush_blocks(self, final: bool) -> bytes:
+        """
+        Compresses every complete pending block, and the incomplete last block if "final" is True
+
+        Args:
+            final (bool): True if no more records will be added
+
+        Returns:
+            bytes: Compressed blocks
+        """
+        block_size = self.block_records * self.recordsize
+        blocks = []
+        start = 0
+        while len(self._pending) - start >= block_size or (final and start < len(self._pending)):
+            block = _compress_block(self._pending[start:start + block_size], self.codec, self.level)
+            self.offsets.append(self.offsets[-1] + len(block))
+            blocks.append(block)
+            start += block_size
+        del self._pending[:start]
+        return b"".join(blocks)
+
+    def add(self, data: bytes) -> bytes:
+        """
+        Adds records to the stream
+
+        Args:
+            data (bytes): Records, "recordsize" bytes each
+
+        Returns:
+            bytes: Compressed blocks completed by "data", to be written after those previously returned
+        """
+        self._pending += data
+        return self._flush_blocks(False)
+
+    def finish(self) -> bytes:
+        """
+        Compresses the incomplete last block and builds the block index
+
+        Returns:
+            bytes: Last compressed block, if any, followed by the block index
+        """
+        blocks = self._flush_blocks(True)
+        return blocks + struct.pack("<%iQ" % len(self.offsets), *self.offsets)
+
+
+class _CompressedStore:
+    """
+    Access to the records of a block-compressed ".geno" container, with the same interface as _RecordStore.
+    Only the blocks holding requested records are read and decompressed, and the last decompressed block is kept so
+    that sequential reads decompress every block once.
+
+    Attributes:
+        filename (str): Location of the compressed ".geno" file
+        recordsize (int): Size of individual record in bytes
+        use_mmap (bool): Always False, compressed records cannot be memory mapped
+        compressed (bool): Always True
+        codec (str): Either "zlib" or "lzma"
+        block_records (int): Number of records per block
+        n_records (int): Number of records, excluding the header record
+        instr (_Instrumentation | None): Receives read and seek counts. None if instrumentation is disabled
+        _fin (IO[bytes]): Binary file object for the ".geno" file
+        _header (bytes): Raw header record
+        _offsets (tuple): File offset of every block, followed by the offset after the last block
+        _block_index (int): Index of the cached block. -1 if no block is cached
+        _block (bytes): Records of the cached block
+        _next_offset (int): Offset following the last read, used to count seeks
+    """
+    use_mmap = False
+    compressed = True
+
+    def __init__(self, filename: str) -> None:
+        """
+        Initializes _CompressedStore object.
+
+        Args:
+            filename (str): Location of the compressed ".geno" file
+        """
+        self.filename = filename
+        self.instr = None
+        self._fin = open(filename, "rb")
+        preamble = self._fin.read(_PREAMBLE_SIZE)
+        if preamble[:len(COMPRESSED_MAGIC)] != COMPRESSED_MAGIC:
+            raise ValueError("\"%s\" is not a compressed .geno file" % filename)
+        (codec, self.block_records, self.recordsize, self.n_records,
+         index_offset) = _LAYOUT.unpack_from(preamble, len(COMPRESSED_MAGIC))
+        if index_offset == 0:
+            raise ValueError("Compressed .geno file \"%s\" was not closed properly" % filename)
+        self.codec = CODECS[codec]
+        self._header = self._fin.read(self.recordsize)
+        n_blocks = -(-self.n_records // self.block_records)
+        self._fin.seek(index_offset)
+        self._offsets = struct.unpack("<%iQ" % (n_blocks + 1), self._fin.read(8 * (n_blocks + 1)))
+        self._block_index = -1
+        self._block = b""
+        self._next_offset = 0
+
+    def __reduce__(self) -> tuple:
+        """
+        Reopens the file when unpickled, allowing stores to be sent to worker processes
+
+        Returns:
+            tuple: Constructor and arguments of the store
+        """
+        return (type(self), (self.filename,))
+
+    def read_header(self) -> bytes:
+        """
+        Reads the header record
+
+        Returns:
+            bytes: Raw header record
+        """
+        return self._header
+
+    def _read_block(self, i_block: int) -> bytes:
+        """
+        Reads and decompresses a block
+
+        Args:
+            i_block (int): Index of the block
+
+        Returns:
+            bytes: Records of the block
+        """
+        if i_block != self._block_index:
+            offset = self._offsets[i_block]
+            size = self._offsets[i_block + 1] - offset
+            if self.instr is not None:
+                self.instr.count("bytes_read", size)
+                if offset != self._next_offset:
+                    self.instr.count("seeks", 1)
+                self._next_offset = offset + size
+            self._fin.seek(offset)
+            self._block = _decompress_block(self._fin.read(size), self.codec)
+            self._block_index = i_block
+        return self._block
+
+    def read(self, start: int, stop: int) -> bytes:
+        """
+        Reads records "start" to "stop" (exclusive)
+
+        Args:
+            start (int): Index of the first record to read
+            stop (int): Index after the last record to read
+
+        Returns:
+            bytes: Raw records
+        """
+        if start >= stop:
+            return b""
+        rs = self.recordsize
+        first_block = start // self.block_records
+        last_block = (stop - 1) // self.block_records
+        if first_block == last_block:
+            base = first_block * self.block_records
+            return self._read_block(first_block)[(start - base) * rs:(stop - base) * rs]
+        parts = []
+        for i_block in range(first_block, last_block + 1):
+            base = i_block * self.block_records
+            block = self._read_block(i_block)
+            parts.append(block[max(0, start - base) * rs:(min(stop, base + self.block_records) - base) * rs])
+        return b"".join(parts)
+
+    def read_span(self, start: int, stop: int, byte_start: int, byte_stop: int) -> bytes:
+        """
+        Reads bytes "byte_start" to "byte_stop" (exclusive) of records "start" to "stop" (exclusive), a 2-D tile of the file
+
+        Args:
+            start (int): Index of the first record to read
+            stop (int): Index after the last record to read
+            byte_start (int): Offset of the first byte to read within every record
+            byte_stop (int): Offset after the last byte to read within every record
+
+        Returns:
+            bytes: Byte range of every record, concatenated
+        """
+        rs = self.recordsize
+        parts = []
+        for i in range(start, stop):
+            i_block, i_record = divmod(i, self.block_records)
+            offset = i_record * rs
+            parts.append(self._read_block(i_block)[offset + byte_start:offset + byte_stop])
+        return b"".join(parts)
+
+    def close(self) -> None:
+        """
+        Closes the file
+        """
+        self._fin.close()
+        self._block = b""
+        self._block_index = -1
+
+
+def _plain_layout(filename: str) -> tuple[int, int]:
+    """
+    Gets the record layout of an uncompressed ".geno" or TGENO file from its header
+
+    Args:
+        filename (str): Location of the file
+
+    Returns:
+        tuple: Size of a record in bytes and number of records, excluding the header record
+    """
+    with open(filename, "rb") as f:
+        header_elems = f.read(64).split(b"\0")[0].split()
+    if not header_elems or header_elems[0] not in (b"GENO", b"TGENO"):
+        raise ValueError("Improper .geno filetype")
+    n_records = int(header_elems[1] if header_elems[0] == b"TGENO" else header_elems[2])
+    recordsize = os.path.getsize(filename) // (n_records + 1)
+    if recordsize * (n_records + 1) != os.path.getsize(filename):
+        raise ValueError("Size of \"%s\" is not a whole number of records" % filename)
+    return recordsize, n_records
+
+
+def compress_geno(geno_file: str, out_file: str, compression: str = "zlib",
+                  compression_level: (int | None) = None,
+                  block_records: int = 4096) -> None:
+    """
+    Converts an uncompressed ".geno" or TGENO file to a block-compressed container. Records are stored unchanged, so "decompress_geno" restores the original file byte for byte
+
+    Args:
+        geno_file (str): Input uncompressed file
+        out_file (str): Output compressed file
+        compression (str): Either "zlib" or "lzma"
+        compression_level (int, optional): Compression level, or preset for "lzma". Defaults to the codec's default
+        block_records (int): Number of records compressed together. Smaller blocks make random access cheaper, larger blocks compress better
+    """
+    recordsize, n_records = _plain_layout(geno_file)
+    compressor = _BlockCompressor(compression, compression_level, block_records, recordsize)
+    chunk_size = max(1, _COPY_SIZE // (recordsize * block_records)) * recordsize * block_records
+    with open(geno_file, "rb") as fin, open(out_file, "wb") as fout:
+        fout.write(compressor.preamble(n_records))
+        fout.write(fin.read(recordsize))
+        while True:
+            chunk = fin.read(chunk_size)
+            if not chunk:
+                break
+            fout.write(compressor.add(chunk))
+        fout.write(compressor.finish())
+        fout.seek(0)
+        fout.write(compressor.preamble(n_records, compressor.offsets[-1]))
+
+
+def decompress_geno(geno_file: str, out_file: str) -> None:
+    """
+    Converts a block-compressed container back to an uncompressed ".geno" or TGENO file
+
+    Args:
+        geno_file (str): Input compressed file
+        out_file (str): Output uncompressed file
+    """
+    store = _CompressedStore(geno_file)
+    try:
+        with open(out_file, "wb") as fout:
+            fout.write(store.read_header())
+            for start in range(0, store.n_records, store.block_records):
+                fout.write(store.read(start, min(start + store.block_records, store.n_records)))
+    finally:
+        store.close()
@@ -0,0 +1,107 @@
+from EIGENTOOLS._merge import _copy_records
+from EIGENTOOLS._read import (SNP_Info, Ind_Info, PackedAncestryMap,
+                              _resolve_ind_selection, _expand_codes)
+from EIGENTOOLS._write import PackedAncestryMapWriter, _pack_codes
+
+
+def _resolve_snp_selection(snp_info: SNP_Info,
+                           selection: list[int] | list[str] | SNP_Info) -> list[int]:
+    """
+    Resolves a selection of SNPs to their indices in a SNP_Info object
+
+    Args:
+        snp_info (SNP_Info): SNPs to select from
+        selection (list | SNP_Info): Either a list of indices, a list of variant names, or a SNP_Info object whose SNPs are a subset of "snp_info"
+
+    Returns:
+        list: Indices of the selected SNPs, in the order of "selection"
+    """
+    if isinstance(selection, SNP_Info):
+        selection = selection.var_name
+    n_snp = len(snp_info)
+    indices = []
+    for i in selection:
+        if isinstance(i, str):
+            indices.append(snp_info.get_var_name_idx(i))
+        elif -n_snp <= i < n_snp:
+            indices.append(i % n_snp)
+        else:
+            raise IndexError("SNP index %i out of range" % i)
+    return indices
+
+
+def _consecutive_runs(indices: list[int]) -> list[tuple[int, int]]:
+    """
+    Splits indices into runs of consecutive increasing indices, keeping their order
+
+    Args:
+        indices (list): Indices to split
+
+    Returns:
+        list: Runs as (start, stop) pairs, "stop" being exclusive
+    """
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return [(start, stop) for start, stop in runs]
+
+
+def extract(reader: PackedAncestryMap,
+            snp_selection: (list[int] | list[str] | SNP_Info | None) = None,
+            ind_selection: (list[int] | set[str] | str | Ind_Info | None) = None,
+            geno_file: (str | None) = None, ind_file: (str | None) = None,
+            snp_file: (str | None) = None, file_prefix: (str | None) = None,
+            chunk_size: int = 4096) -> None:
+    """
+    Writes a subset of the SNPs and individuals of a PackedAncestryMap file to a new PackedAncestryMap file.
+    Selected 2-bit codes are gathered straight from the input bytes into the output bytes through a gather plan
+    computed once, and SNP-only subsets are copied as whole records without repacking.
+
+    Args:
+        reader (PackedAncestryMap): Input file. Must not have an individual selection
+        snp_selection (list | SNP_Info, optional): Either a list of indices, a list of variant names, or a SNP_Info object. All SNPs are kept if None
+        ind_selection (list | set | str | Ind_Info, optional): Either a list of indices, a label or set of labels, or an Ind_Info object. All individuals are kept if None
+        geno_file (str, optional): Output .geno file, cannot be used alongside "file_prefix" parameter
+        ind_file (str, optional): Output .ind file, cannot be used alongside "file_prefix" parameter
+        snp_file (str, optional): Output .snp file, cannot be used alongside "file_prefix" parameter
+        file_prefix (str, optional): Prefix for all output PackedAncestryMap files. Cannot be used alongside "geno_file", "ind_file", or "snp_file" parameters
+        chunk_size (int): Maximum number of SNPs read at once
+    """
+    if reader._ind_idx is not None:
+        raise ValueError("Input cannot have an individual selection.")
+    if snp_selection is None:
+        snp_idx = list(range(len(reader.snp_info)))
+    else:
+        snp_idx = _resolve_snp_selection(reader.snp_info, snp_selection)
+    ind_idx = None
+    ind_info = reader.ind_info
+    if ind_selection is not None:
+        ind_idx = _resolve_ind_selection(reader.ind_info, ind_selection)
+        ind_info = reader.ind_info[ind_idx]
+    writer = PackedAncestryMapWriter(reader.snp_info[snp_idx], ind_info,
+                                     geno_file=geno_file, ind_file=ind_file,
+                                     snp_file=snp_file, file_prefix=file_prefix)
+    runs = _consecutive_runs(snp_idx)
+    if ind_idx is None:
+        _copy_records(reader, writer, runs)
+        writer.close()
+        return
+    # gather plan: the codes of every selected individual are gathered from the expanded chunk with one strided copy
+    stride = 4 * reader._recordsize
+    width = len(ind_idx)
+    for run_start, run_stop in runs:
+        for start in range(run_start, run_stop, chunk_size):
+            stop = min(start + chunk_size, run_stop)
+            codes = _expand_codes(bytes(reader._store.read(start, stop)))
+            gathered = bytearray((stop - start) * width)
+            for k, i in enumerate(ind_idx):
+                gathered[k::width] = codes[i::stride]
+            records = []
+            for i_record in range(stop - start):
+                records.append(_pack_codes(gathered[i_record * width:(i_record + 1) * width]))
+                records.append(writer._trailingbytes)
+            writer._write_packed(b"".join(records), stop - start)
+    writer.close()
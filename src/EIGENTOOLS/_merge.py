@@ -0,0 +1,180 @@
+from contextlib import nullcontext
+from functools import reduce
+from itertools import chain
+from math import ceil
+from operator import add
+from EIGENTOOLS._read import PackedAncestryMap
+from EIGENTOOLS._write import PackedAncestryMapWriter
+
+
+# number of bytes read at once when records have to be repadded
+_CHUNK_BYTES = 1 << 24
+# runs of records at least this large are copied between files without going through Python
+_MIN_COPY_BYTES = 1 << 20
+
+
+def _resize_records(buf: bytes, n_records: int, in_size: int, n_bytes: int,
+                    out_size: int) -> bytes:
+    """
+    Changes the padding of packed SNP records to a different record size
+
+    Args:
+        buf (bytes): Packed records, "in_size" bytes per record
+        n_records (int): Number of records in "buf"
+        in_size (int): Size of an input record in bytes
+        n_bytes (int): Number of bytes of a record holding dosages
+        out_size (int): Size of an output record in bytes
+
+    Returns:
+        bytes: Packed records, "out_size" bytes per record
+    """
+    padding = bytes(out_size - n_bytes)
+    return b"".join(chain.from_iterable(
+        (buf[i * in_size:i * in_size + n_bytes], padding) for i in range(n_records)))
+
+
+def _copy_records(reader: PackedAncestryMap, writer: PackedAncestryMapWriter,
+                  runs: (list[tuple[int, int]] | None) = None) -> None:
+    """
+    Copies packed SNP records from a reader to a writer without decoding them. Long runs of records are copied straight
+    between the files through a single handle on the input, while short runs are gathered through the reader into
+    large buffered writes
+
+    Args:
+        reader (PackedAncestryMap): Input file. Must not have an individual selection
+        writer (PackedAncestryMapWriter): Output file, with the same individuals as "reader"
+        runs (list, optional): Ranges of SNPs to copy, in order, as (start, stop) pairs with "stop" exclusive. Defaults to every SNP
+    """
+    if runs is None:
+        runs = [(0, len(reader.snp_info))]
+    in_size = reader._recordsize
+    out_size = writer._recordsize
+    direct = in_size == out_size and not reader._store.compressed
+    chunk_records = max(1, _CHUNK_BYTES // in_size)
+    pending = []
+    n_pending = 0
+    with open(reader._store.filename, "rb") if direct else nullcontext() as src:
+        for run_start, run_stop in runs:
+            if direct and (run_stop - run_start) * in_size >= _MIN_COPY_BYTES:
+                if pending:
+                    writer._write_packed(b"".join(pending), n_pending)
+                    pending, n_pending = [], 0
+                writer._copy_packed(src, (1 + run_start) * in_size, run_stop - run_start)
+                continue
+            for start in range(run_start, run_stop, chunk_records):
+                stop = min(start + chunk_records, run_stop)
+                buf = reader._store.read(start, stop)
+                if in_size != out_size:
+                    buf = _resize_records(buf, stop - start, in_size, reader._recordbytes, out_size)
+                pending.append(buf)
+                n_pending += stop - start
+                if n_pending >= chunk_records:
+                    writer._write_packed(b"".join(pending), n_pending)
+                    pending, n_pending = [], 0
+        if pending:
+            writer._write_packed(b"".join(pending), n_pending)
+
+
+def concatenate(inputs: list[PackedAncestryMap], geno_file: (str | None) = None,
+                ind_file: (str | None) = None, snp_file: (str | None) = None,
+                file_prefix: (str | None) = None) -> None:
+    """
+    Appends PackedAncestryMap files with the same individuals SNP-wise. Records are copied byte for byte without decoding.
+
+    Args:
+        inputs (list): PackedAncestryMap objects to append, in order. None of them may have an individual selection
+        geno_file (str, optional): Output .geno file, cannot be used alongside "file_prefix" parameter
+        ind_file (str, optional): Output .ind file, cannot be used alongside "file_prefix" parameter
+        snp_file (str, optional): Output .snp file, cannot be used alongside "file_prefix" parameter
+        file_prefix (str, optional): Prefix for all output PackedAncestryMap files. Cannot be used alongside "geno_file", "ind_file", or "snp_file" parameters
+    """
+    if not inputs:
+        raise ValueError("At least one input is required.")
+    ind_info = inputs[0].ind_info
+    for reader in inputs:
+        if reader._ind_idx is not None:
+            raise ValueError("Inputs cannot have an individual selection.")
+        if (reader.ind_info._hash != ind_info._hash) or (reader.ind_info.ind_name != ind_info.ind_name):
+            raise ValueError("All inputs must have the same individuals.")
+    snp_info = reduce(add, [reader.snp_info for reader in inputs])
+    writer = PackedAncestryMapWriter(snp_info, ind_info, geno_file=geno_file,
+                                     ind_file=ind_file, snp_file=snp_file,
+                                     file_prefix=file_prefix)
+    for reader in inputs:
+        _copy_records(reader, writer)
+    writer.close()
+
+
+def _splice_records(records: list[bytes], n_inds: list[int], n_bytes: int) -> bytes:
+    """
+    Splices packed SNP records of different individuals into a single record. The 2-bit codes of every record are
+    shifted as a whole onto the tail of the previous ones, at any bit offset, without decoding individual genotypes.
+
+    Args:
+        records (list): Packed records to splice, in order
+        n_inds (list): Number of individuals in each record
+        n_bytes (int): Number of bytes of the spliced record holding dosages
+
+    Returns:
+        bytes: Spliced record, without trailing padding bytes
+    """
+    value = 0
+    for record, n_ind in zip(records, n_inds):
+        record_bytes = ceil(n_ind / 4)
+        codes = int.from_bytes(record[:record_bytes]) >> (2 * (4 * record_bytes - n_ind))
+        value = (value << (2 * n_ind)) | codes
+    return (value << (2 * (4 * n_bytes - sum(n_inds)))).to_bytes(n_bytes)
+
+
+def merge_individuals(inputs: list[PackedAncestryMap], geno_file: (str | None) = None,
+                      ind_file: (str | None) = None, snp_file: (str | None) = None,
+                      file_prefix: (str | None) = None, chunk_size: int = 256) -> None:
+    """
+    Merges PackedAncestryMap files with the same SNPs but different individuals. SNPs are written in the order of the
+    first input and matched by variant name in the others. Records are spliced together without decoding, so memory
+    use is bounded by "chunk_size" records per input.
+
+    Args:
+        inputs (list): PackedAncestryMap objects to merge, in order. None of them may have an individual selection
+        geno_file (str, optional): Output .geno file, cannot be used alongside "file_prefix" parameter
+        ind_file (str, optional): Output .ind file, cannot be used alongside "file_prefix" parameter
+        snp_file (str, optional): Output .snp file, cannot be used alongside "file_prefix" parameter
+        file_prefix (str, optional): Prefix for all output PackedAncestryMap files. Cannot be used alongside "geno_file", "ind_file", or "snp_file" parameters
+        chunk_size (int): Number of SNPs processed at once
+    """
+    if not inputs:
+        raise ValueError("At least one input is required.")
+    snp_info = inputs[0].snp_info
+    n_snp = len(snp_info)
+    # map SNPs of the first input onto the others, None meaning identical order
+    snp_maps = []
+    for reader in inputs:
+        if reader._ind_idx is not None:
+            raise ValueError("Inputs cannot have an individual selection.")
+        if len(reader.snp_info) != n_snp:
+            raise ValueError("All inputs must have the same SNPs.")
+        if reader.snp_info.var_name == snp_info.var_name:
+            snp_maps.append(None)
+        else:
+            snp_maps.append([reader.snp_info.get_var_name_idx(var_name)
+                             for var_name in snp_info.var_name])
+    ind_info = reduce(add, [reader.ind_info for reader in inputs])
+    n_inds = [reader._nind for reader in inputs]
+    writer = PackedAncestryMapWriter(snp_info, ind_info, geno_file=geno_file,
+                                     ind_file=ind_file, snp_file=snp_file,
+                                     file_prefix=file_prefix)
+    n_bytes = ceil(len(ind_info) / 4)
+    for start in range(0, n_snp, chunk_size):
+        stop = min(start + chunk_size, n_snp)
+        chunk_records = []
+        for reader, snp_map in zip(inputs, snp_maps):
+            rs = reader._recordsize
+            if snp_map is None:
+                buf = reader._store.read(start, stop)
+                chunk_records.append([buf[i * rs:(i + 1) * rs] for i in range(stop - start)])
+            else:
+                chunk_records.append([reader._store.read(i, i + 1) for i in snp_map[start:stop]])
+        records = [_splice_records(snp_records, n_inds, n_bytes) + writer._trailingbytes
+                   for snp_records in zip(*chunk_records)]
+        writer._write_packed(b"".join(records), stop - start)
+    writer.close()
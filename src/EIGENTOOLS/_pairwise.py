@@ -0,0 +1,146 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal
+
+from EIGENTOOLS._compress import _CompressedStore
+from EIGENTOOLS._popstats import population_stats
+from EIGENTOOLS._read import PackedAncestryMap, _RecordStore, _decode_block
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+def _tile_features(block, kind: str, freqs, start: int, stop: int) -> tuple:
+    """
+    Computes the per-individual features of a decoded SNP block whose pairwise products are accumulated
+
+    Args:
+        block (numpy.ndarray): int8 dosages of shape (number of SNPs, number of individuals of the tile), -1 marking missing dosages
+        kind (str): Either "ibs" or "grm"
+        freqs (numpy.ndarray | None): Reference allele frequency of every SNP of the file. Only used if "kind" is "grm"
+        start (int): Index of the first SNP of the block
+        stop (int): Index after the last SNP of the block
+
+    Returns:
+        tuple: Row features, column features and float32 indicator of usable dosages. The sum of the products of row and column features over SNPs is the numerator of the pairwise statistic, and that of the indicators its denominator
+    """
+    if kind == "ibs":
+        called = block >= 0
+        hom_ref = (block == 2).astype(np.float32)
+        het = (block == 1).astype(np.float32)
+        hom_alt = (block == 0).astype(np.float32)
+        # |g_i - g_j| as a sum of products of genotype indicators
+        rows = np.concatenate((hom_alt, het, hom_ref))
+        cols = np.concatenate((het + 2 * hom_ref, hom_alt + hom_ref, 2 * hom_alt + het))
+        return rows, cols, called.astype(np.float32)
+    p = freqs[start:stop, None]
+    polymorphic = (p > 0) & (p < 1)
+    called = (block >= 0) & polymorphic
+    scale = np.sqrt(np.where(polymorphic, 2 * p * (1 - p), 1))
+    z = np.where(called, (block - 2 * p) / scale, 0).astype(np.float32)
+    return z, z, called.astype(np.float32)
+
+
+def _pairwise_task(store: _RecordStore | _CompressedStore, n_snp: int, n_ind: int,
+                   ind_idx: (list[int] | None), kind: str, freqs,
+                   tiles: list[tuple[int, int, int, int]], block_size: int,
+                   output: str) -> None:
+    """
+    Accumulates the pairwise statistic of a group of output tiles over every SNP block and writes the tiles to the output matrix
+
+    Args:
+        store (_RecordStore | _CompressedStore): Record access to the ".geno" file
+        n_snp (int): Number of SNPs
+        n_ind (int): Number of individuals in the ".geno" file
+        ind_idx (list, optional): Indices of the individuals of the output matrix. All individuals are used if None
+        kind (str): Either "ibs" or "grm"
+        freqs (numpy.ndarray | None): Reference allele frequency of every SNP. Only used if "kind" is "grm"
+        tiles (list): Output tiles as (row start, row stop, column start, column stop). Tiles below the diagonal are filled by symmetry
+        block_size (int): Number of SNPs decoded at once
+        output (str): Location of the ".npy" output matrix
+    """
+    ranges = sorted({tile[:2] for tile in tiles} | {tile[2:] for tile in tiles})
+    numerators = {tile: np.zeros((tile[1] - tile[0], tile[3] - tile[2])) for tile in tiles}
+    denominators = {tile: np.zeros((tile[1] - tile[0], tile[3] - tile[2])) for tile in tiles}
+    for start in range(0, n_snp, block_size):
+        stop = min(start + block_size, n_snp)
+        block = _decode_block(store.read(start, stop), stop - start, store.recordsize,
+                              n_ind, ind_idx=ind_idx)
+        features = {(r0, r1): _tile_features(block[:, r0:r1], kind, freqs, start, stop)
+                    for r0, r1 in ranges}
+        for tile in tiles:
+            rows, _, row_called = features[tile[:2]]
+            _, cols, col_called = features[tile[2:]]
+            numerators[tile] += rows.T @ cols
+            denominators[tile] += row_called.T @ col_called
+    out = np.load(output, mmap_mode="r+")
+    for (r0, r1, c0, c1) in tiles:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = numerators[r0, r1, c0, c1] / denominators[r0, r1, c0, c1]
+        if kind == "ibs":
+            values /= 2
+        out[r0:r1, c0:c1] = values
+        out[c0:c1, r0:r1] = values.T
+    out.flush()
+    del out
+
+
+def pairwise(reader: PackedAncestryMap, output: str,
+             kind: Literal["ibs", "grm"] = "ibs", freqs: (list[float] | None) = None,
+             block_size: int = 256, tile_size: int = 2048,
+             n_workers: (int | None) = 1):
+    """
+    Computes a pairwise matrix between every pair of individuals and writes it as a memory-mapped ".npy" file.
+    SNP blocks are streamed from the file, decoded into compact int8 tiles, and pairwise sums are accumulated per output
+    tile with matrix products. Only SNPs called in both individuals of a pair contribute to it. Memory use is bounded by
+    the tile accumulators, about twice the size of the output, plus one decoded SNP block per worker. Requires NumPy.
+
+    Args:
+        reader (PackedAncestryMap): Input file. Only the selected individuals are used if it has an individual selection, for instance a set of labels
+        output (str): Location of the ".npy" output matrix, of shape (number of individuals, number of individuals)
+        kind (str): "ibs" for the identity-by-state distance, the mean of |g_i - g_j| / 2 over SNPs, or "grm" for the genomic relationship matrix, the mean of the products of standardized dosages (g - 2p) / sqrt(2p(1 - p)). Monomorphic SNPs are ignored by "grm"
+        freqs (list, optional): Reference allele frequency of every SNP, used by "grm". Defaults to the frequencies of the selected individuals, computed with "population_stats"
+        block_size (int): Number of SNPs decoded at once
+        tile_size (int): Number of individuals per output tile side
+        n_workers (int, optional): Number of worker processes the output tiles are split across. Tiles are computed in the current process if 1. Defaults to the number of CPUs if None
+
+    Returns:
+        numpy.memmap: Pairwise matrix, mapped read-only from "output". Pairs without SNPs called in both individuals are nan
+    """
+    if np is None:
+        raise ImportError("NumPy is required for pairwise")
+    if kind not in ("ibs", "grm"):
+        raise ValueError("Kind must either be \"ibs\" or \"grm\".")
+    n_snp = len(reader.snp_info)
+    n = len(reader.ind_info)
+    if kind == "grm":
+        if freqs is None:
+            stats = population_stats(reader, n_workers=n_workers)
+            n_labels = len(stats.labels)
+            ref_count = np.frombuffer(stats.ref_count, dtype=np.uint32).reshape(n_snp, n_labels)
+            missing_count = np.frombuffer(stats.missing_count, dtype=np.uint32).reshape(n_snp, n_labels)
+            n_called = sum(stats.label_sizes) - missing_count.sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                freqs = ref_count.sum(axis=1) / (2 * n_called)
+        freqs = np.asarray(freqs, dtype=np.float64)
+        if freqs.shape != (n_snp,):
+            raise ValueError("There should be one frequency per SNP (%i)." % n_snp)
+        freqs = np.nan_to_num(freqs, nan=0.0)
+    np.lib.format.open_memmap(output, mode="w+", dtype=np.float64, shape=(n, n)).flush()
+    bounds = [(start, min(start + tile_size, n)) for start in range(0, n, tile_size)]
+    tiles = [row + col for i, row in enumerate(bounds) for col in bounds[i:]]
+    # spread the tiles over the workers, alternating so that every worker gets diagonal and off-diagonal tiles
+    n_tasks = 1 if n_workers == 1 else min(len(tiles), n_workers or os.cpu_count() or 1)
+    groups = [tiles[i::n_tasks] for i in range(n_tasks)] if tiles else []
+    args = (n_snp, reader._nind, reader._ind_idx, kind, freqs)
+    if n_tasks == 1:
+        for group in groups:
+            _pairwise_task(reader._store, *args, group, block_size, output)
+    else:
+        with ProcessPoolExecutor(n_workers) as executor:
+            list(executor.map(_pairwise_task, [reader._store] * n_tasks,
+                              *[[arg] * n_tasks for arg in args], groups,
+                              [block_size] * n_tasks, [output] * n_tasks))
+    return np.load(output, mmap_mode="r")
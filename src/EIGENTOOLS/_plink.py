@@ -0,0 +1,276 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+
+from EIGENTOOLS._merge import _resize_records
+from EIGENTOOLS._read import SNP_Info, Ind_Info, PackedAncestryMap
+from EIGENTOOLS._write import PackedAncestryMapWriter, _write_at
+
+
+# magic number of a SNP-major PLINK .bed file
+BED_MAGIC = b"\x6c\x1b\x01"
+# .bed code (0 homozygous first allele, 1 missing, 2 heterozygous, 3 homozygous second allele) to PACKEDANCESTRYMAP code
+_BED_TO_GENO = (2, 3, 1, 0)
+_GENO_TO_BED = (3, 2, 0, 1)
+# .bed stores the first individual in the least significant bits of a byte, PACKEDANCESTRYMAP in the most significant
+_BED_TO_GENO_TABLE = bytes(sum(_BED_TO_GENO[(b >> (2 * k)) & 3] << (6 - 2 * k) for k in range(4))
+                           for b in range(256))
+_GENO_TO_BED_TABLE = bytes(sum(_GENO_TO_BED[(b >> (6 - 2 * k)) & 3] << (2 * k) for k in range(4))
+                           for b in range(256))
+_SEX_FROM_FAM = {"1": "M", "2": "F"}
+_SEX_TO_FAM = {"M": "1", "F": "2"}
+
+
+def _bed_files(bed_file: (str | None), bim_file: (str | None),
+               fam_file: (str | None), bed_prefix: (str | None)) -> tuple:
+    """
+    Resolves the names of the files of a PLINK fileset
+
+    Args:
+        bed_file (str, optional): .bed file, cannot be used alongside "bed_prefix" parameter
+        bim_file (str, optional): .bim file, cannot be used alongside "bed_prefix" parameter
+        fam_file (str, optional): .fam file, cannot be used alongside "bed_prefix" parameter
+        bed_prefix (str, optional): Prefix for all PLINK files. Cannot be used alongside "bed_file", "bim_file", or "fam_file" parameters
+
+    Returns:
+        tuple: Names of the .bed, .bim, and .fam files
+    """
+    paramter_error_msg = "Inappropriate parametrization. Either only provide a 'bed_prefix' parameter or provide parameters for each individual PLINK file component"
+    if bed_prefix is None:
+        if not ((bed_file is not None) and (bim_file is not None) and
+                (fam_file is not None)):
+            raise TypeError(paramter_error_msg)
+        return bed_file, bim_file, fam_file
+    if not ((bed_file is None) and (bim_file is None) and (fam_file is None)):
+        raise TypeError(paramter_error_msg)
+    return bed_prefix + ".bed", bed_prefix + ".bim", bed_prefix + ".fam"
+
+
+def _write_bim(snp_info: SNP_Info, filename: str) -> None:
+    """
+    Writes SNP information as a PLINK .bim file. The genetic position is converted from Morgans to centimorgans, and the reference and variant alleles become the first and second alleles
+
+    Args:
+        snp_info (SNP_Info): SNP information
+        filename (str): Output filename
+    """
+    with open(filename, "w+") as f:
+        for i in range(len(snp_info)):
+            f.write("%s\t%s\t%.6f\t%i\t%s\t%s\n" %
+                    (snp_info.chrom[i], snp_info.var_name[i], snp_info.cm[i] * 100,
+                     snp_info.pos[i], snp_info.ref[i], snp_info.alt[i]))
+
+
+def _write_fam(ind_info: Ind_Info, filename: str) -> None:
+    """
+    Writes individual information as a PLINK .fam file. Labels become family IDs and individual names individual IDs. Parents and phenotypes are unknown
+
+    Args:
+        ind_info (Ind_Info): Individual information
+        filename (str): Output filename
+    """
+    with open(filename, "w+") as f:
+        for i in range(len(ind_info)):
+            f.write("%s\t%s\t0\t0\t%s\t-9\n" %
+                    (ind_info.label[i], ind_info.ind_name[i],
+                     _SEX_TO_FAM.get(ind_info.sex[i], "0")))
+
+
+def _bim_to_snp(bim_file: str, snp_file: str) -> None:
+    """
+    Converts a PLINK .bim file to a ".snp" file, reversing "_write_bim"
+
+    Args:
+        bim_file (str): Input .bim file
+        snp_file (str): Output ".snp" file
+    """
+    with open(bim_file) as fin, open(snp_file, "w+") as fout:
+        for line in fin:
+            chrom, var_name, cm, pos, ref, alt = line.split()
+            # two more decimals than .bim files carry, so that centimorgans survive the conversion to Morgans
+            fout.write("%s\t%s\t%.8f\t%s\t%s\t%s\n" %
+                       (var_name, chrom, float(cm) / 100, pos, ref, alt))
+
+
+def _fam_to_ind(fam_file: str, ind_file: str) -> None:
+    """
+    Converts a PLINK .fam file to a ".ind" file, reversing "_write_fam"
+
+    Args:
+        fam_file (str): Input .fam file
+        ind_file (str): Output ".ind" file
+    """
+    with open(fam_file) as fin, open(ind_file, "w+") as fout:
+        for line in fin:
+            elems = line.split()
+            fout.write("%s\t%s\t%s\n" % (elems[1], _SEX_FROM_FAM.get(elems[4], "U"), elems[0]))
+
+
+def _convert_chunk(src_file: str, src_offset: int, in_size: int,
+                   dst: str | PackedAncestryMapWriter, dst_start: int, out_size: int,
+                   n_bytes: int, n_records: int, table: bytes,
+                   mask_table: (bytes | None)) -> None:
+    """
+    Converts a range of consecutive records from one packed format to the other and writes them to their place in a preallocated output file
+
+    Args:
+        src_file (str): Input file
+        src_offset (int): Byte offset of the first record in "src_file"
+        in_size (int): Size of an input record in bytes
+        dst (str | PackedAncestryMapWriter): Preallocated output .bed file, or preallocated writer of the output .geno file
+        dst_start (int): Index of the first record in "dst"
+        out_size (int): Size of an output record in bytes
+        n_bytes (int): Number of bytes of a record holding genotypes
+        n_records (int): Number of records to convert
+        table (bytes): Translation table converting a packed byte
+        mask_table (bytes, optional): Translation table clearing the padding bits of the last genotype byte of a record. None if there are none
+    """
+    with open(src_file, "rb") as f:
+        f.seek(src_offset)
+        buf = f.read(n_records * in_size)
+    if len(buf) != n_records * in_size:
+        raise ValueError("File \"%s\" ended before all records were read." % src_file)
+    buf = buf.translate(table)
+    if in_size != out_size:
+        buf = _resize_records(buf, n_records, in_size, n_bytes, out_size)
+    if mask_table is not None:
+        buf = bytearray(buf)
+        buf[n_bytes - 1::out_size] = buf[n_bytes - 1::out_size].translate(mask_table)
+    if isinstance(dst, PackedAncestryMapWriter):
+        dst._write_records_at(buf, dst_start, n_records)
+        if not dst._owner:  # copy of the writer sent to a worker process
+            dst.close()
+    else:
+        with open(dst, "r+b") as f:
+            _write_at(f, buf, len(BED_MAGIC) + dst_start * out_size)
+
+
+def _convert_records(src_file: str, src_start: int, in_size: int,
+                     dst: str | PackedAncestryMapWriter, out_size: int, n_ind: int, n_snp: int,
+                     table: bytes, to_bed: bool, chunk_size: int,
+                     n_workers: (int | None)) -> None:
+    """
+    Converts every record of a file to the other packed format, chunk by chunk
+
+    Args:
+        src_file (str): Input file
+        src_start (int): Byte offset of the first record in "src_file"
+        in_size (int): Size of an input record in bytes
+        dst (str | PackedAncestryMapWriter): Preallocated output .bed file, or preallocated writer of the output .geno file
+        out_size (int): Size of an output record in bytes
+        n_ind (int): Number of individuals
+        n_snp (int): Number of SNPs
+        table (bytes): Translation table converting a packed byte
+        to_bed (bool): True if the output is a .bed file
+        chunk_size (int): Number of SNPs converted at once
+        n_workers (int, optional): Number of worker processes. Chunks are converted in the current process if 1. Defaults to the number of CPUs if None
+    """
+    n_bytes = ceil(n_ind / 4)
+    mask_table = None
+    if n_ind % 4:
+        n_bits = 2 * (n_ind % 4)
+        mask = (1 << n_bits) - 1 if to_bed else (0xff << (8 - n_bits)) & 0xff
+        mask_table = bytes(b & mask for b in range(256))
+    starts = range(0, n_snp, chunk_size)
+    args = [(src_file, src_start + start * in_size, in_size, dst, start, out_size, n_bytes,
+             min(chunk_size, n_snp - start), table, mask_table) for start in starts]
+    if n_workers == 1:
+        for arg in args:
+            _convert_chunk(*arg)
+    else:
+        with ProcessPoolExecutor(n_workers) as executor:
+            list(executor.map(_convert_chunk, *zip(*args)))
+
+
+def to_bed(reader: PackedAncestryMap, bed_file: (str | None) = None,
+           bim_file: (str | None) = None, fam_file: (str | None) = None,
+           bed_prefix: (str | None) = None, chunk_size: int = 4096,
+           n_workers: (int | None) = 1) -> None:
+    """
+    Converts a PackedAncestryMap file to a SNP-major PLINK .bed fileset without decoding genotypes. Every packed byte
+    is converted with a single 256-entry translation table, after which records are repadded and the padding bits of
+    their last byte cleared. Labels become family IDs, and the reference allele becomes the first allele of the .bim file.
+
+    Args:
+        reader (PackedAncestryMap): Input file. Must not have an individual selection
+        bed_file (str, optional): Output .bed file, cannot be used alongside "bed_prefix" parameter
+        bim_file (str, optional): Output .bim file, cannot be used alongside "bed_prefix" parameter
+        fam_file (str, optional): Output .fam file, cannot be used alongside "bed_prefix" parameter
+        bed_prefix (str, optional): Prefix for all output PLINK files. Cannot be used alongside "bed_file", "bim_file", or "fam_file" parameters
+        chunk_size (int): Number of SNPs converted at once
+        n_workers (int, optional): Number of worker processes converting SNP ranges in parallel. Chunks are converted in the current process if 1. Defaults to the number of CPUs if None
+    """
+    if reader._ind_idx is not None:
+        raise ValueError("Input cannot have an individual selection.")
+    if reader._store.compressed:
+        raise ValueError("Input cannot be a compressed .geno file. Convert it with decompress_geno first.")
+    bed_file, bim_file, fam_file = _bed_files(bed_file, bim_file, fam_file, bed_prefix)
+    _write_bim(reader.snp_info, bim_file)
+    _write_fam(reader.ind_info, fam_file)
+    n_ind, n_snp = reader._nind, len(reader.snp_info)
+    with open(bed_file, "wb") as f:
+        f.write(BED_MAGIC)
+        f.truncate(len(BED_MAGIC) + n_snp * ceil(n_ind / 4))
+    _convert_records(reader._store.filename, reader._recordsize, reader._recordsize,
+                     bed_file, ceil(n_ind / 4), n_ind, n_snp,
+                     _GENO_TO_BED_TABLE, True, chunk_size, n_workers)
+
+
+def from_bed(bed_file: (str | None) = None, bim_file: (str | None) = None,
+             fam_file: (str | None) = None, bed_prefix: (str | None) = None,
+             geno_file: (str | None) = None, ind_file: (str | None) = None,
+             snp_file: (str | None) = None, file_prefix: (str | None) = None,
+             chunk_size: int = 4096, n_workers: (int | None) = 1) -> None:
+    """
+    Converts a SNP-major PLINK .bed fileset to a PackedAncestryMap file without decoding genotypes, reversing "to_bed".
+    Family IDs become labels, and the first allele of the .bim file becomes the reference allele.
+
+    Args:
+        bed_file (str, optional): Input .bed file, cannot be used alongside "bed_prefix" parameter
+        bim_file (str, optional): Input .bim file, cannot be used alongside "bed_prefix" parameter
+        fam_file (str, optional): Input .fam file, cannot be used alongside "bed_prefix" parameter
+        bed_prefix (str, optional): Prefix for all input PLINK files. Cannot be used alongside "bed_file", "bim_file", or "fam_file" parameters
+        geno_file (str, optional): Output .geno file, cannot be used alongside "file_prefix" parameter
+        ind_file (str, optional): Output .ind file, cannot be used alongside "file_prefix" parameter
+        snp_file (str, optional): Output .snp file, cannot be used alongside "file_prefix" parameter
+        file_prefix (str, optional): Prefix for all output PackedAncestryMap files. Cannot be used alongside "geno_file", "ind_file", or "snp_file" parameters
+        chunk_size (int): Number of SNPs converted at once
+        n_workers (int, optional): Number of worker processes converting SNP ranges in parallel. Chunks are converted in the current process if 1. Defaults to the number of CPUs if None
+    """
+    bed_file, bim_file, fam_file = _bed_files(bed_file, bim_file, fam_file, bed_prefix)
+    paramter_error_msg = "Inappropriate parametrization. Either only provide a 'file_prefix' parameter or provide parameters for each individual PACKEDANCESTRYMAP file component"
+    # parameter handling to allow for init polymorphism
+    if file_prefix is None:
+        if not ((geno_file is not None) and (ind_file is not None) and
+                (snp_file is not None)):
+            raise TypeError(paramter_error_msg)
+    else:
+        if not ((geno_file is None) and (ind_file is None) and
+                (snp_file is None)):
+            raise TypeError(paramter_error_msg)
+        else:
+            geno_file = file_prefix + ".geno"
+            ind_file = file_prefix + ".ind"
+            snp_file = file_prefix + ".snp"
+    _bim_to_snp(bim_file, snp_file)
+    _fam_to_ind(fam_file, ind_file)
+    snp_info = SNP_Info(snp_file)
+    ind_info = Ind_Info(ind_file)
+    n_ind, n_snp = len(ind_info), len(snp_info)
+    with open(bed_file, "rb") as f:
+        magic = f.read(len(BED_MAGIC))
+    if magic != BED_MAGIC:
+        raise ValueError("\"%s\" is not a SNP-major .bed file" % bed_file)
+    expected_size = len(BED_MAGIC) + n_snp * ceil(n_ind / 4)
+    if os.path.getsize(bed_file) != expected_size:
+        raise ValueError("Size of .bed file (%i bytes) different from what is expected by the .bim and .fam files (%i bytes)" %
+                         (os.path.getsize(bed_file), expected_size))
+    writer = PackedAncestryMapWriter(snp_info, ind_info, geno_file, ind_file,
+                                     snp_file, write_snp=False, write_ind=False,
+                                     preallocate=True)
+    try:
+        _convert_records(bed_file, len(BED_MAGIC), ceil(n_ind / 4), writer,
+                         writer._recordsize, n_ind, n_snp, _BED_TO_GENO_TABLE, False,
+                         chunk_size, n_workers)
+    finally:
+        writer.close()
@@ -0,0 +1,257 @@
+from array import array
+from math import nan
+from operator import add
+
+from EIGENTOOLS._read import SNP_Info, Ind_Info, PackedAncestryMap, _expand_codes
+
+
+class _ChunkCounter:
+    """
+    Picklable function counting genotypes of a chunk of raw records. Used through PackedAncestryMap.map_reduce
+
+    Attributes:
+        recordsize (int): Size of individual SNP record in bytes
+        positions (list): Position in the ".geno" file of every individual, grouped by label
+        members (list): Index in the Ind_Info object of every individual of "positions"
+        ranges (list): Range of every reported label within "positions", as (start, stop) pairs
+        identity (bool): True if "positions" lists every individual of the file in file order
+        n_ind (int): Number of individuals in the Ind_Info object
+    """
+    def __init__(self, recordsize: int, positions: list[int], members: list[int],
+                 ranges: list[tuple[int, int]], identity: bool, n_ind: int) -> None:
+        """
+        Initializes _ChunkCounter object.
+
+        Args:
+            recordsize (int): Size of individual SNP record in bytes
+            positions (list): Position in the ".geno" file of every individual, grouped by label
+            members (list): Index in the Ind_Info object of every individual of "positions"
+            ranges (list): Range of every reported label within "positions"
+            identity (bool): True if "positions" lists every individual of the file in file order
+            n_ind (int): Number of individuals in the Ind_Info object
+        """
+        self.recordsize = recordsize
+        self.positions = positions
+        self.members = members
+        self.ranges = ranges
+        self.identity = identity
+        self.n_ind = n_ind
+
+    def __call__(self, block: bytes, start: int) -> tuple:
+        """
+        Counts the genotypes of a chunk
+
+        Args:
+            block (bytes): Raw records of the chunk
+            start (int): Index of the first SNP of the chunk. Unused
+
+        Returns:
+            tuple: Reference allele, heterozygote and missing counts per SNP and label, followed by missing and heterozygote counts per individual
+        """
+        stride = 4 * self.recordsize
+        n_records = len(block) // self.recordsize
+        codes = _expand_codes(block)
+        ind_missing = array("I", bytes(4 * self.n_ind))
+        ind_het = array("I", bytes(4 * self.n_ind))
+        width = len(self.positions)
+        grouped = codes if self.identity else bytearray(n_records * width)
+        for k, (position, member) in enumerate(zip(self.positions, self.members)):
+            column = codes[position::stride]
+            ind_missing[member] = column.count(3)
+            ind_het[member] = column.count(1)
+            if not self.identity:
+                grouped[k::width] = column
+        if self.identity:
+            width = stride
+        ref_count = array("I")
+        het_count = array("I")
+        missing_count = array("I")
+        for base in range(0, n_records * width, width):
+            for label_start, label_stop in self.ranges:
+                label_start += base
+                label_stop += base
+                n_het = grouped.count(1, label_start, label_stop)
+                n_hom = grouped.count(2, label_start, label_stop)
+                ref_count.append(n_het + 2 * n_hom)
+                het_count.append(n_het)
+                missing_count.append(grouped.count(3, label_start, label_stop))
+        return ref_count, het_count, missing_count, ind_missing, ind_het
+
+
+def _combine_counts(counts: tuple, other: tuple) -> tuple:
+    """
+    Combines the counts of two consecutive chunks
+
+    Args:
+        counts (tuple): Counts of the first chunk, extended in place
+        other (tuple): Counts of the following chunk
+
+    Returns:
+        tuple: Combined counts
+    """
+    for values, other_values in zip(counts[:3], other[:3]):
+        values.extend(other_values)
+    return (*counts[:3], array("I", map(add, counts[3], other[3])),
+            array("I", map(add, counts[4], other[4])))
+
+
+class PopulationStats:
+    """
+    Per-population and per-individual genotype counts of a PackedAncestryMap file. Per SNP and label counts are stored
+    row-major in compact arrays, the count of SNP "i" and label "k" being at index i * len(labels) + k. They can be
+    viewed as matrices with numpy.frombuffer(counts, dtype=numpy.uint32).reshape(-1, len(labels)).
+
+    Attributes:
+        snp_info (SNP_Info): SNPs the counts refer to
+        ind_info (Ind_Info): Individuals the counts refer to
+        labels (list): Reported labels
+        label_sizes (list): Number of individuals with every label
+        ref_count (array): Number of reference alleles per SNP and label
+        het_count (array): Number of heterozygous individuals per SNP and label
+        missing_count (array): Number of individuals with a missing genotype per SNP and label
+        ind_missing (array): Number of missing genotypes per individual
+        ind_het (array): Number of heterozygous genotypes per individual
+    """
+    def __init__(self, snp_info: SNP_Info, ind_info: Ind_Info, labels: list[str],
+                 label_sizes: list[int], counts: tuple) -> None:
+        """
+        Initializes PopulationStats object.
+
+        Args:
+            snp_info (SNP_Info): SNPs the counts refer to
+            ind_info (Ind_Info): Individuals the counts refer to
+            labels (list): Reported labels
+            label_sizes (list): Number of individuals with every label
+            counts (tuple): Reference allele, heterozygote and missing counts per SNP and label, followed by missing and heterozygote counts per individual
+        """
+        self.snp_info = snp_info
+        self.ind_info = ind_info
+        self.labels = labels
+        self.label_sizes = label_sizes
+        (self.ref_count, self.het_count, self.missing_count,
+         self.ind_missing, self.ind_het) = counts
+
+    def _label_index(self, label: str) -> int:
+        """
+        Gets the position of a label among the reported labels
+
+        Args:
+            label (str): Label of interest
+
+        Returns:
+            int: Position of "label" in "labels"
+        """
+        try:
+            return self.labels.index(label)
+        except ValueError:
+            raise LookupError("Label \"" + label + "\" not found.")
+
+    def frequency(self, label: str) -> list[float]:
+        """
+        Gets the reference allele frequency of a label for every SNP
+
+        Args:
+            label (str): Label of interest
+
+        Returns:
+            list: Reference allele frequency per SNP. nan if every genotype of the label is missing
+        """
+        k = self._label_index(label)
+        n = self.label_sizes[k]
+        n_labels = len(self.labels)
+        return [ref / (2 * (n - n_missing)) if n != n_missing else nan
+                for ref, n_missing in zip(self.ref_count[k::n_labels],
+                                          self.missing_count[k::n_labels])]
+
+    def missing_rate(self, label: str) -> list[float]:
+        """
+        Gets the fraction of missing genotypes of a label for every SNP
+
+        Args:
+            label (str): Label of interest
+
+        Returns:
+            list: Missing genotype rate per SNP. nan if no individual has the label
+        """
+        k = self._label_index(label)
+        n = self.label_sizes[k]
+        return [n_missing / n if n else nan
+                for n_missing in self.missing_count[k::len(self.labels)]]
+
+    def write(self, filename: str) -> None:
+        """
+        Writes the per SNP and label counts as a tab-separated table with one row per SNP and label
+
+        Args:
+            filename (str): Output filename
+        """
+        n_labels = len(self.labels)
+        with open(filename, "w+") as f:
+            f.write("var_name\tlabel\tn_called\tref_count\thet_count\tmissing_count\tfrequency\n")
+            for i, var_name in enumerate(self.snp_info.var_name):
+                for k, label in enumerate(self.labels):
+                    j = i * n_labels + k
+                    n_called = self.label_sizes[k] - self.missing_count[j]
+                    freq = self.ref_count[j] / (2 * n_called) if n_called else nan
+                    f.write("%s\t%s\t%i\t%i\t%i\t%i\t%.6f\n" %
+                            (var_name, label, n_called, self.ref_count[j],
+                             self.het_count[j], self.missing_count[j], freq))
+
+    def write_ind(self, filename: str) -> None:
+        """
+        Writes the per individual counts as a tab-separated table with one row per individual
+
+        Args:
+            filename (str): Output filename
+        """
+        n_snp = len(self.snp_info)
+        with open(filename, "w+") as f:
+            f.write("ind_name\tlabel\tmissing_count\thet_count\tmissing_rate\thet_rate\n")
+            for i, ind_name in enumerate(self.ind_info.ind_name):
+                n_called = n_snp - self.ind_missing[i]
+                f.write("%s\t%s\t%i\t%i\t%.6f\t%.6f\n" %
+                        (ind_name, self.ind_info.label[i], self.ind_missing[i],
+                         self.ind_het[i], self.ind_missing[i] / n_snp if n_snp else nan,
+                         self.ind_het[i] / n_called if n_called else nan))
+
+
+def population_stats(reader: PackedAncestryMap, labels: (list[str] | None) = None,
+                     n_workers: (int | None) = 1, chunk_size: int = 4096) -> PopulationStats:
+    """
+    Computes per-population allele, heterozygote and missing counts for every SNP, and per-individual missing and
+    heterozygote counts, in a single pass over the packed records. Records are expanded to one code per byte with
+    translation tables and counted with bytes.count, so no Python work is done per genotype.
+    The position of the iterator is left unchanged.
+
+    Args:
+        reader (PackedAncestryMap): Input file. Only the selected individuals are counted if it has an individual selection
+        labels (list, optional): Labels to report. Defaults to every label, in order of first appearance
+        n_workers (int, optional): Number of worker processes. Chunks are processed in the current process if 1. Defaults to the number of CPUs if None
+        chunk_size (int): Number of SNPs per chunk
+
+    Returns:
+        PopulationStats: Genotype counts
+    """
+    ind_info = reader.ind_info
+    if labels is None:
+        labels = list(dict.fromkeys(ind_info.label))
+    file_positions = reader._ind_idx if reader._ind_idx is not None else range(len(ind_info))
+    members = []
+    ranges = []
+    for label in labels:
+        indices = ind_info.get_label_indices(label)
+        ranges.append((len(members), len(members) + len(indices)))
+        members.extend(indices)
+    reported = set(members)
+    members.extend(i for i in range(len(ind_info)) if i not in reported)
+    positions = [file_positions[i] for i in members]
+    identity = reader._ind_idx is None and members == list(range(reader._nind))
+    counter = _ChunkCounter(reader._recordsize, positions, members, ranges,
+                            identity, len(ind_info))
+    counts = reader.map_reduce(counter, _combine_counts, n_workers, chunk_size,
+                               block_type="raw")
+    if counts is None:
+        counts = (array("I"), array("I"), array("I"),
+                  array("I", bytes(4 * len(ind_info))), array("I", bytes(4 * len(ind_info))))
+    return PopulationStats(reader.snp_info, ind_info, labels,
+                           [stop - start for start, stop in ranges], counts)
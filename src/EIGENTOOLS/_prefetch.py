@@ -0,0 +1,145 @@
+import queue
+import threading
+
+
+class _Prefetcher:
+    """
+    Reads consecutive SNP records of a ".geno" file ahead of the consumer. A background thread fills a bounded ring
+    of buffers with multi-record chunks while the consumer decodes the current chunk, overlapping I/O and decoding.
+
+    Attributes:
+        filename (str): Location of the ".geno" file
+        recordsize (int): Size of individual SNP record in bytes
+        n_snp (int): Number of SNPs in the file
+        chunk_records (int): Number of records read into each buffer
+        depth (int): Number of buffers in the ring, bounding how far the thread reads ahead
+        _free (queue.Queue): Buffers ready to be filled
+        _full (queue.Queue): Filled buffers, as (first SNP index, number of records, buffer) tuples
+        _stop (threading.Event): Set to ask the thread to exit
+        _thread (threading.Thread | None): Reading thread. None if not started
+        _chunk (tuple | None): Chunk currently being consumed
+        instr (_Instrumentation | None): Receives read counts. None if instrumentation is disabled
+    """
+    def __init__(self, filename: str, recordsize: int, n_snp: int,
+                 chunk_records: int, depth: int) -> None:
+        """
+        Initializes _Prefetcher object. The reading thread is only started by the first call to "record"
+
+        Args:
+            filename (str): Location of the ".geno" file
+            recordsize (int): Size of individual SNP record in bytes
+            n_snp (int): Number of SNPs in the file
+            chunk_records (int): Number of records read into each buffer
+            depth (int): Number of buffers in the ring
+        """
+        self.filename = filename
+        self.recordsize = recordsize
+        self.n_snp = n_snp
+        self.chunk_records = max(1, chunk_records)
+        self.depth = max(2, depth)
+        self._free = None
+        self._full = None
+        self._stop = None
+        self._thread = None
+        self._chunk = None
+        self.instr = None
+
+    def _run(self, start: int, free: queue.Queue, full: queue.Queue,
+             stop: threading.Event) -> None:
+        """
+        Body of the reading thread. Fills free buffers with consecutive chunks starting at SNP "start"
+
+        Args:
+            start (int): Index of the first SNP to read
+            free (queue.Queue): Buffers ready to be filled. None is put in the queue to wake the thread on shutdown
+            full (queue.Queue): Queue receiving filled buffers, followed by None at the end of the file
+            stop (threading.Event): Set to ask the thread to exit
+        """
+        rs = self.recordsize
+        try:
+            with open(self.filename, "rb", buffering=0) as f:
+                f.seek((1 + start) * rs)
+                for chunk_start in range(start, self.n_snp, self.chunk_records):
+                    buf = free.get()
+                    if buf is None or stop.is_set():
+                        return
+                    n_records = min(self.chunk_records, self.n_snp - chunk_start)
+                    view = memoryview(buf)[:n_records * rs]
+                    n_read = 0
+                    while n_read < len(view):
+                        n = f.readinto(view[n_read:])
+                        if not n:
+                            raise EOFError("File \"%s\" ended before all records were read." % self.filename)
+                        n_read += n
+                    view.release()
+                    full.put((chunk_start, n_records, buf))
+            full.put(None)
+        except Exception as e:
+            full.put(e)
+
+    def _start(self, start: int) -> None:
+        """
+        Starts a new reading thread at a given SNP, shutting down any running one
+
+        Args:
+            start (int): Index of the first SNP to read
+        """
+        self.close()
+        self._free = queue.Queue()
+        for _ in range(self.depth):
+            self._free.put(bytearray(self.chunk_records * self.recordsize))
+        self._full = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        args=(start, self._free, self._full, self._stop))
+        self._thread.start()
+
+    def _next_chunk(self) -> None:
+        """
+        Returns the current buffer to the ring and waits for the next chunk
+        """
+        if self._chunk is not None:
+            self._free.put(self._chunk[2])
+            self._chunk = None
+        chunk = self._full.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        if self.instr is not None and chunk is not None:
+            self.instr.count("bytes_read", chunk[1] * self.recordsize)
+        self._chunk = chunk
+
+    def record(self, i_snp: int) -> memoryview:
+        """
+        Gets the raw record of a SNP. Reading continues sequentially from the requested SNP, so any other access pattern restarts the thread
+
+        Args:
+            i_snp (int): Index of the SNP
+
+        Returns:
+            memoryview: Raw record, only valid until the next call
+        """
+        chunk = self._chunk
+        if chunk is None or not (chunk[0] <= i_snp < chunk[0] + chunk[1]):
+            if chunk is not None and self._thread is not None and i_snp == chunk[0] + chunk[1]:
+                self._next_chunk()
+            else:
+                self._start(i_snp)
+                if self.instr is not None:
+                    self.instr.count("seeks", 1)
+                self._next_chunk()
+            chunk = self._chunk
+            if chunk is None:
+                raise IndexError("SNP index out of range")
+        offset = (i_snp - chunk[0]) * self.recordsize
+        return memoryview(chunk[2])[offset:offset + self.recordsize]
+
+    def close(self) -> None:
+        """
+        Stops the reading thread and waits for it to exit
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._free.put(None)
+            self._thread.join()
+            self._thread = None
+        self._chunk = None
@@ -1,13 +1,149 @@
 import copy
+import mmap
 import os
-from math import floor, nan
-from typing import Self
+import weakref
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left, bisect_right
+from functools import lru_cache, reduce
+from itertools import chain
+from math import ceil, floor, nan
+from sys import intern
+from time import perf_counter
+from typing import Callable, Literal, Self
+
+from EIGENTOOLS._cache import load_cache, write_cache
+from EIGENTOOLS._compress import _CompressedStore, is_compressed
+from EIGENTOOLS._prefetch import _Prefetcher
+from EIGENTOOLS._stats import _Instrumentation
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
 
 
 GENO_MAP = [0, 1, 2, nan]
+# maps every possible byte of a packed record to the four dosages it encodes
+_BYTE_TO_GENO = [tuple(GENO_MAP[(b >> shift) & 3] for shift in (6, 4, 2, 0))
+                 for b in range(256)]
+# translation tables extracting the 2-bit code of each position within a packed byte
+_CODE_TABLES = [bytes((b >> shift) & 3 for b in range(256)) for shift in (6, 4, 2, 0)]
+
+
+def _expand_codes(block: bytes) -> bytearray:
+    """
+    Expands packed records to one 2-bit code per byte
+
+    Args:
+        block (bytes): Packed records
+
+    Returns:
+        bytearray: Four codes per byte of "block", the first code of each byte first
+    """
+    codes = bytearray(4 * len(block))
+    for offset, table in enumerate(_CODE_TABLES):
+        codes[offset::4] = block.translate(table)
+    return codes
+
+
+def _decode_record(record: bytes, n_ind: int,
+                   ind_plan: (list[tuple[int, int]] | None) = None) -> list:
+    """
+    Decodes a packed SNP record into a list of dosages
+
+    Args:
+        record (bytes): Raw SNP record
+        n_ind (int): Number of individuals in the record
+        ind_plan (list, optional): Byte offset and position within byte of the individuals to decode. All individuals are decoded if None
+
+    Returns:
+        list: Allelic dosages, mapped through GENO_MAP
+    """
+    if ind_plan is not None:
+        return [_BYTE_TO_GENO[record[i_byte]][i_pos] for i_byte, i_pos in ind_plan]
+    dosages = list(chain.from_iterable(map(_BYTE_TO_GENO.__getitem__,
+                                           record[:ceil(n_ind / 4)])))
+    del dosages[n_ind:]
+    return dosages
+
+
+@lru_cache(maxsize=None)
+def _array_table(dtype: str, missing: int):
+    """
+    Builds a NumPy lookup table mapping every possible byte to the four dosages it encodes
+
+    Args:
+        dtype (str): NumPy dtype of the returned table
+        missing (int): Value used for missing dosages. Must be representable in "dtype"
+
+    Returns:
+        numpy.ndarray: Array of shape (256, 4)
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu":
+        info = np.iinfo(dtype)
+        if not (info.min <= missing <= info.max):
+            raise ValueError("Missing value %s cannot be stored as %s. Choose a value within [%i, %i]%s." %
+                             (missing, dtype, info.min, info.max,
+                              ", for instance 3" if dtype.kind == "u" else ""))
+    codes = np.array([[(b >> shift) & 3 for shift in (6, 4, 2, 0)]
+                      for b in range(256)], dtype=np.uint8)
+    return np.array([0, 1, 2, missing], dtype=dtype)[codes]
+
+
+def _decode_block(buf: bytes, n_records: int, recordsize: int, n_ind: int,
+                  dtype: str = "int8", missing: int = -1,
+                  ind_idx: (list[int] | None) = None):
+    """
+    Decodes a contiguous run of packed SNP records into a dosage matrix
+
+    Args:
+        buf (bytes): Raw bytes of the records, "recordsize" bytes per record
+        n_records (int): Number of records in "buf"
+        recordsize (int): Size of an individual SNP record in bytes
+        n_ind (int): Number of individuals per record
+        dtype (str): NumPy dtype of the returned matrix
+        missing (int): Value used for missing dosages
+        ind_idx (list, optional): Indices of the individuals to decode. All individuals are decoded if None
+
+    Returns:
+        numpy.ndarray: Array of shape (n_records, n_ind), or (n_records, len(ind_idx)) if "ind_idx" is given
+    """
+    packed = np.frombuffer(buf, dtype=np.uint8, count=n_records * recordsize)
+    packed = packed.reshape(n_records, recordsize)[:, :ceil(n_ind / 4)]
+    if ind_idx is not None:
+        ind_idx = np.asarray(ind_idx, dtype=np.intp)
+        return _array_table(dtype, missing)[packed[:, ind_idx >> 2], ind_idx & 3]
+    dosages = _array_table(dtype, missing)[packed]
+    dosages = dosages.reshape(n_records, packed.shape[1] * 4)
+    return np.ascontiguousarray(dosages[:, :n_ind])
+
+
+def _take(values: list, index: int | slice | list[int]) -> list:
+    """
+    Subsets a list or array by an integer, a slice, or a list of integer indices
+
+    Args:
+        values (list | array): List or array to subset
+        index (int | slice | list): Index of elements to include
+
+    Returns:
+        list | array: Subsetted list or array, of the same type as "values" even when "index" is an integer
+    """
+    if isinstance(index, slice):
+        return values[index]
+    subset = [values[index]] if isinstance(index, int) else [values[i] for i in index]
+    if isinstance(values, array):
+        return array(values.typecode, subset)
+    return subset
 
 
 # hashing functions
+# lists with at least this many strings are hashed with NumPy, in chunks of this size
+_BULK_HASH_MIN = 1 << 16
+
+
 def hash_str(s: str) -> int:
     """
     Hash function for string, designed to be used with EIGENSTRAT individual ID
@@ -25,18 +161,48 @@ def hash_str(s: str) -> int:
     return hash_out
 
 
-def hash_list(str_list: list[str]) -> int:
+def _hash_str_array(str_list: list[str]):
     """
-    Hash function for list of strings. Designed to be used on a collection of EIGENSTRAT individual IDs
+    Vectorized version of "hash_str" for many strings, truncated to 32 bits
 
     Args:
         str_list: List of strings
 
     Returns:
-        int: 32-bit hash of list of strings
+        numpy.ndarray: uint32 array holding the 32 lowest bits of "hash_str" of every string
+    """
+    strs = np.array(str_list, dtype=str)
+    codes = strs.view(np.uint32).reshape(len(str_list), -1)
+    width = codes.shape[1]
+    # unsigned arithmetic wraps around, keeping the 32 lowest bits
+    hashes = np.zeros(len(str_list), dtype=np.uint32)
+    for j in range(width):
+        hashes = hashes * np.uint32(23) + codes[:, j]
+    # undo the extra factors of 23 from trailing padding, 23 being invertible modulo 2 ** 32
+    inverse = pow(23, -1, 2 ** 32)
+    inverse_powers = np.array([pow(inverse, k, 2 ** 32) for k in range(width + 1)],
+                              dtype=np.uint32)
+    return hashes * inverse_powers[width - np.char.str_len(strs)]
+
+
+def _extend_hash(hash_out: int, str_list: list[str]) -> int:
+    """
+    Extends the hash of a list of strings with more strings, such that _extend_hash(hash_list(a), b) == hash_list(a + b)
+
+    Args:
+        hash_out (int): Hash of the preceding strings
+        str_list: List of strings to fold into the hash
+
+    Returns:
+        int: 32-bit hash of the preceding strings followed by "str_list"
     """
-    hash_out = 0
     bit_mask = ((2 ** 32) - 1)
+    if np is not None and len(str_list) >= _BULK_HASH_MIN:
+        for start in range(0, len(str_list), _BULK_HASH_MIN):
+            thashes = _hash_str_array(str_list[start:start + _BULK_HASH_MIN]).tolist()
+            for thash in thashes:
+                hash_out = ((hash_out * 17) ^ thash) & bit_mask
+        return hash_out
     for s in str_list:
         thash = hash_str(s)
         hash_out *= 17
@@ -44,49 +210,83 @@ def hash_list(str_list: list[str]) -> int:
     return hash_out
 
 
+def hash_list(str_list: list[str]) -> int:
+    """
+    Hash function for list of strings. Designed to be used on a collection of EIGENSTRAT individual IDs
+
+    Args:
+        str_list: List of strings
+
+    Returns:
+        int: 32-bit hash of list of strings
+    """
+    return _extend_hash(0, str_list)
+
+
+_SNP_COLUMNS = (("var_name", "str"), ("chrom", "cat"), ("cm", "d"),
+                ("pos", "q"), ("ref", "cat"), ("alt", "cat"))
+_IND_COLUMNS = (("ind_name", "str"), ("sex", "cat"), ("label", "cat"))
+
+
 class SNP_Info:
     """
-    Class storing SNP information from EIGENSTRAT ".snp" file
+    Class storing SNP information from EIGENSTRAT ".snp" file. Numeric columns are stored in typed arrays and
+    repeated strings are interned, while the reverse index and hash are only computed when first needed.
 
     Attributes:
         var_name (list): List of variant names
-        chrom (list): List of chromosome positions
-        cm (list): List of centimorgan positions
-        pos (list): List of genomic positions
-        ref (list): List of reference alleles
-        alt (list): List of alternative alleles
-        _var_name_to_index (dict): Reverse index for var_name
-        _hash (int): Hash value for .snp file
+        chrom (list): List of chromosome positions. Identical values share one interned string
+        cm (array): Array of centimorgan positions
+        pos (array): Array of genomic positions
+        ref (list): List of reference alleles. Identical values share one interned string
+        alt (list): List of alternative alleles. Identical values share one interned string
+        _var_name_to_index (dict | None): Reverse index for var_name. None until first needed
+        _pos_index (dict | None): Per-chromosome sorted positions and their SNP indices. None until first needed
+        _hash_value (int | None): Hash value for .snp file. None until first needed
     """
-    def __init__(self, filename: str) -> None:
+    def __init__(self, filename: str, use_cache: bool = False) -> None:
         """
         Initializes SNP_Info object.
 
         Args:
             filename (str): Location of the ".snp" file
+            use_cache (bool): If True the parsed file is loaded from, or saved to, a binary "<filename>.eigcache" sidecar file. The cache is rebuilt whenever the ".snp" file changes
         """
+        self._var_name_to_index = None
+        self._pos_index = None
+        self._hash_value = None
+        if use_cache and load_cache(self, filename, _SNP_COLUMNS):
+            return
         self.var_name = []
         self.chrom = []
-        self.cm = []
-        self.pos = []
+        self.cm = array("d")
+        self.pos = array("q")
         self.ref = []
         self.alt = []
-        self._var_name_to_index = {}
-        self._hash = 0
 
         with open(filename) as f:
-            i = 0
             for line in f:
                 elems = line.strip().split()
                 self.var_name.append(elems[0])
-                self.chrom.append(elems[1])
+                self.chrom.append(intern(elems[1]))
                 self.cm.append(float(elems[2]))
                 self.pos.append(int(elems[3]))
-                self.ref.append(elems[4])
-                self.alt.append(elems[5])
-                i += 1
-        self._var_name_to_index = self._reverse_index()
-        self._hash = hash_list(self.var_name)
+                self.ref.append(intern(elems[4]))
+                self.alt.append(intern(elems[5]))
+        if use_cache:
+            write_cache(self, filename, _SNP_COLUMNS)
+
+    @property
+    def _hash(self) -> int:
+        """
+        Hash value for .snp file, computed on first access
+
+        Returns:
+            int: Hash of the variant names
+        """
+        if self._hash_value is None:
+            self._hash_value = hash_list(self.var_name)
+        return self._hash_value
 
     def _reverse_index(self) -> dict:
         """
@@ -95,32 +295,28 @@ class SNP_Info:
         Returns:
             dict: A reverse index dictionary
         """
-        out = {}
-        for i in range(len(self)):
-            out[self.var_name[i]] = i
-        return out
+        return dict(zip(self.var_name, range(len(self.var_name))))
 
-    def __getitem__(self, index: int | slice) -> Self:
+    def __getitem__(self, index: int | slice | list[int]) -> Self:
         """
-        Subsets the SNP_Info object to only those SNPs at a given index
+        Subsets the SNP_Info object to only those SNPs at a given index. The hash and reverse index of the subset are computed lazily
 
         Args:
-            index (int | slice): Index of elements to include
+            index (int | slice | list): Index of elements to include
 
         Returns:
             SNP_Info: Subsetted SNP_Info
         """
-        is_int = isinstance(index, int)
         tmp_obj = copy.copy(self)
-        tmp_obj.var_name = [tmp_obj.var_name[index]] if is_int else tmp_obj.var_name[index]
-        tmp_obj.chrom = [tmp_obj.chrom[index]] if is_int else tmp_obj.chrom[index]
-        tmp_obj.pos = [tmp_obj.pos[index]] if is_int else tmp_obj.pos[index]
-        tmp_obj.ref = [tmp_obj.ref[index]] if is_int else tmp_obj.ref[index]
-        tmp_obj.alt = [tmp_obj.alt[index]] if is_int else tmp_obj.alt[index]
-        tmp_obj.cm = [tmp_obj.cm[index]] if is_int else tmp_obj.cm[index]
-        tmp_obj._hash = hash_list(tmp_obj.var_name)
-        # redo reverse index
-        tmp_obj._var_name_to_index = tmp_obj._reverse_index()
+        tmp_obj.var_name = _take(tmp_obj.var_name, index)
+        tmp_obj.chrom = _take(tmp_obj.chrom, index)
+        tmp_obj.pos = _take(tmp_obj.pos, index)
+        tmp_obj.ref = _take(tmp_obj.ref, index)
+        tmp_obj.alt = _take(tmp_obj.alt, index)
+        tmp_obj.cm = _take(tmp_obj.cm, index)
+        tmp_obj._hash_value = None
+        tmp_obj._var_name_to_index = None
+        tmp_obj._pos_index = None
         return tmp_obj
 
     def __len__(self) -> int:
@@ -135,7 +331,7 @@ class SNP_Info:
 
     def __add__(self, obj2: Self) -> Self:
         """
-        Adds two SNP_Info objects
+        Adds two SNP_Info objects. The hash of the result extends the hash of the current object with the variants of "obj2" only
 
         Args:
             obj2 (SNP_Info): The SNP_Info file to append to current object
@@ -150,8 +346,9 @@ class SNP_Info:
         tmp_obj.ref = tmp_obj.ref + obj2.ref
         tmp_obj.alt = tmp_obj.alt + obj2.alt
         tmp_obj.cm = tmp_obj.cm + obj2.cm
-        tmp_obj._hash = hash_list(tmp_obj.var_name)
-        tmp_obj._var_name_to_index = tmp_obj._reverse_index()
+        tmp_obj._hash_value = _extend_hash(self._hash, obj2.var_name)
+        tmp_obj._var_name_to_index = None
+        tmp_obj._pos_index = None
         return tmp_obj
 
     def get_var_name_idx(self, var_name: str) -> int:
@@ -164,11 +361,53 @@ class SNP_Info:
         Returns:
             int: index of variant name
         """
+        if self._var_name_to_index is None:
+            self._var_name_to_index = self._reverse_index()
         try:
             return self._var_name_to_index[var_name]
         except KeyError:
             raise LookupError("Variant \"" + var_name + "\" not found")
 
+    def _position_index(self) -> dict:
+        """
+        Creates a per-chromosome index of SNPs sorted by genomic position
+
+        Returns:
+            dict: Dictionary mapping each chromosome to an array of sorted positions and an array of the matching SNP indices
+        """
+        by_chrom = {}
+        for i, (chrom, pos) in enumerate(zip(self.chrom, self.pos)):
+            try:
+                by_chrom[chrom].append((pos, i))
+            except KeyError:
+                by_chrom[chrom] = [(pos, i)]
+        out = {}
+        for chrom, entries in by_chrom.items():
+            entries.sort()
+            out[chrom] = (array("q", [pos for pos, _ in entries]),
+                          array("q", [i for _, i in entries]))
+        return out
+
+    def get_region_indices(self, chrom: str, start: int, end: int) -> list[int]:
+        """
+        Gets the indices of the SNPs within a genomic region using binary search on a per-chromosome position index
+
+        Args:
+            chrom (str): Chromosome of the region
+            start (int): First position of the region
+            end (int): Last position of the region (inclusive)
+
+        Returns:
+            list: Sorted indices of the SNPs in the region
+        """
+        if self._pos_index is None:
+            self._pos_index = self._position_index()
+        try:
+            positions, indices = self._pos_index[str(chrom)]
+        except KeyError:
+            return []
+        return sorted(indices[bisect_left(positions, start):bisect_right(positions, end)])
+
     def write(self, filename: str) -> None:
         """
         Writes object to ".snp" file
@@ -185,57 +424,70 @@ class SNP_Info:
 
 class Ind_Info:
     """
-    Class storing individual information from EIGENSTRAT ".ind" file
+    Class storing individual information from EIGENSTRAT ".ind" file. Repeated strings are interned, while the
+    reverse index and hash are only computed when first needed.
 
     Attributes:
         ind_name (list): List of individual IDs from file
-        sex (list): List of individuals' sex
-        label (list): List of labels for individuals. Usually a population name
-        _label_to_idx (dict): Reverse index for label.
-        _hash (int): Hash value for .ind file
+        sex (list): List of individuals' sex. Identical values share one interned string
+        label (list): List of labels for individuals. Usually a population name. Identical values share one interned string
+        _label_to_idx (dict | None): Reverse index for label. None until first needed
+        _hash_value (int | None): Hash value for .ind file. None until first needed
     """
 
-    def __init__(self, filename: str) -> None:
+    def __init__(self, filename: str, use_cache: bool = False) -> None:
         """
         Initializes Ind_Info object.
 
         Args:
             filename (str): Location of the ".ind" file
+            use_cache (bool): If True the parsed file is loaded from, or saved to, a binary "<filename>.eigcache" sidecar file. The cache is rebuilt whenever the ".ind" file changes
         """
+        self._label_to_idx = None
+        self._hash_value = None
+        if use_cache and load_cache(self, filename, _IND_COLUMNS):
+            return
         self.ind_name = []
         self.sex = []
         self.label = []
-        self._label_to_idx = {}
-        self._hash = 0
 
         with open(filename) as f:
-            i = 0
             for line in f:
                 elems = line.strip().split()
                 self.ind_name.append(elems[0])
-                self.sex.append(elems[1])
-                self.label.append(elems[2])
-                i += 1
-        self._label_to_idx = self._reverse_index()
-        self._hash = hash_list(self.ind_name)
+                self.sex.append(intern(elems[1]))
+                self.label.append(intern(elems[2]))
+        if use_cache:
+            write_cache(self, filename, _IND_COLUMNS)
+
+    @property
+    def _hash(self) -> int:
+        """
+        Hash value for .ind file, computed on first access
 
-    def __getitem__(self, index: int | slice) -> Self:
+        Returns:
+            int: Hash of the individual IDs
         """
-        Subsets the Ind_Info object to only those individuals at a given index
+        if self._hash_value is None:
+            self._hash_value = hash_list(self.ind_name)
+        return self._hash_value
+
+    def __getitem__(self, index: int | slice | list[int]) -> Self:
+        """
+        Subsets the Ind_Info object to only those individuals at a given index. The hash and reverse index of the subset are computed lazily
 
         Args:
-            index (int | slice): Index of elements to include
+            index (int | slice | list): Index of elements to include
 
         Returns:
             Ind_Info: Subsetted Ind_Info
         """
-        is_int = isinstance(index, int)
         tmp_obj = copy.copy(self)
-        tmp_obj.ind_name = [tmp_obj.ind_name[index]] if is_int else tmp_obj.ind_name[index]
-        tmp_obj.sex = [tmp_obj.sex[index]] if is_int else tmp_obj.sex[index]
-        tmp_obj.label = [tmp_obj.label[index]] if is_int else tmp_obj.label[index]
-        tmp_obj._hash = hash_list(tmp_obj.ind_name)
-        tmp_obj._label_to_idx = tmp_obj._reverse_index()
+        tmp_obj.ind_name = _take(tmp_obj.ind_name, index)
+        tmp_obj.sex = _take(tmp_obj.sex, index)
+        tmp_obj.label = _take(tmp_obj.label, index)
+        tmp_obj._hash_value = None
+        tmp_obj._label_to_idx = None
         return tmp_obj
 
     def __len__(self) -> int:
@@ -250,7 +502,7 @@ class Ind_Info:
 
     def __add__(self, obj2: Self) -> Self:
         """
-        Adds two Ind_Info objects
+        Adds two Ind_Info objects. The hash of the result extends the hash of the current object with the individuals of "obj2" only
 
         Args:
             obj2 (Ind_Info): The Ind_Info file to append to current object
@@ -262,8 +514,8 @@ class Ind_Info:
         tmp_obj.ind_name = tmp_obj.ind_name + obj2.ind_name
         tmp_obj.sex = tmp_obj.sex + obj2.sex
         tmp_obj.label = tmp_obj.label + obj2.label
-        tmp_obj._hash = hash_list(tmp_obj.ind_name)
-        tmp_obj._label_to_idx = tmp_obj._reverse_index()
+        tmp_obj._hash_value = _extend_hash(self._hash, obj2.ind_name)
+        tmp_obj._label_to_idx = None
         return tmp_obj
 
     def _reverse_index(self) -> dict:
@@ -274,11 +526,11 @@ class Ind_Info:
             dict: A reverse index dictionary
         """
         out = {}
-        for i in range(len(self)):
+        for i, label in enumerate(self.label):
             try:
-                out[self.label[i]].append(i)
+                out[label].append(i)
             except KeyError:
-                out[self.label[i]] = [i]
+                out[label] = [i]
         return out
 
     def get_label_indices(self, label: str) -> list:
@@ -288,6 +540,8 @@ class Ind_Info:
         Args:
             label (str): Label of the items whose indices will be return
         """
+        if self._label_to_idx is None:
+            self._label_to_idx = self._reverse_index()
         try:
             return self._label_to_idx[label]
         except KeyError:
@@ -306,25 +560,252 @@ class Ind_Info:
                         (self.ind_name[i], self.sex[i], self.label[i]))
 
 
+def _coalesce(indices: list[int], max_gap: int = 0) -> list[tuple[int, int]]:
+    """
+    Merges sorted indices into contiguous runs
+
+    Args:
+        indices (list): Sorted, unique indices
+        max_gap (int): Maximum number of unused indices allowed between two indices of the same run
+
+    Returns:
+        list: Runs as (start, stop) pairs, "stop" being exclusive
+    """
+    runs = []
+    for i in indices:
+        if runs and i - runs[-1][1] <= max_gap:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+    return [(start, stop) for start, stop in runs]
+
+
+def _resolve_ind_selection(ind_info: Ind_Info,
+                           selection: list[int] | set[str] | str | Ind_Info) -> list[int]:
+    """
+    Resolves a selection of individuals to their indices in an Ind_Info object
+
+    Args:
+        ind_info (Ind_Info): Individuals to select from
+        selection (list | set | str | Ind_Info): Either a list of indices, a label or set of labels, or an Ind_Info object whose individuals are a subset of "ind_info"
+
+    Returns:
+        list: Indices of the selected individuals. Labels are returned in file order, otherwise the order of "selection" is kept
+    """
+    if isinstance(selection, Ind_Info):
+        name_to_idx = {name: i for i, name in enumerate(ind_info.ind_name)}
+        try:
+            return [name_to_idx[name] for name in selection.ind_name]
+        except KeyError as e:
+            raise LookupError("Individual \"" + e.args[0] + "\" not found.")
+    if isinstance(selection, str):
+        selection = {selection}
+    if isinstance(selection, (set, frozenset)):
+        return sorted(chain.from_iterable(ind_info.get_label_indices(label)
+                                          for label in selection))
+    n_ind = len(ind_info)
+    indices = []
+    for i in selection:
+        if not (-n_ind <= i < n_ind):
+            raise IndexError("Individual index %i out of range" % i)
+        indices.append(i % n_ind)
+    return indices
+
+
+class _RecordStore:
+    """
+    Access to the fixed-size records of a ".geno" file, either through a regular file handle or a read-only memory map.
+    Memory mapped stores return zero-copy memoryview slices and are safe to share across forked processes.
+
+    Attributes:
+        filename (str): Location of the ".geno" file
+        recordsize (int): Size of individual SNP record in bytes
+        use_mmap (bool): True if the file is memory mapped
+        compressed (bool): Always False, records are stored uncompressed and can be copied straight from the file
+        _fin (IO[bytes]): Binary file object for the ".geno" file
+        _mm (mmap.mmap | None): Memory map of the ".geno" file
+        _view (memoryview | None): memoryview over the whole memory map
+        instr (_Instrumentation | None): Receives read and seek counts. None if instrumentation is disabled
+        _next_offset (int): Offset following the last read, used to count seeks
+    """
+    compressed = False
+
+    def __init__(self, filename: str, recordsize: int, use_mmap: bool = False) -> None:
+        """
+        Initializes _RecordStore object.
+
+        Args:
+            filename (str): Location of the ".geno" file
+            recordsize (int): Size of individual SNP record in bytes
+            use_mmap (bool): Memory maps the file if True
+        """
+        self.filename = filename
+        self.recordsize = recordsize
+        self.use_mmap = use_mmap
+        self._fin = open(filename, "rb")
+        self._mm = None
+        self._view = None
+        self.instr = None
+        self._next_offset = 0
+        if use_mmap:
+            self._mm = mmap.mmap(self._fin.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mm)
+
+    def __reduce__(self) -> tuple:
+        """
+        Reopens the file when unpickled, allowing stores to be sent to worker processes
+
+        Returns:
+            tuple: Constructor and arguments of the store
+        """
+        return (type(self), (self.filename, self.recordsize, self.use_mmap))
+
+    def read_header(self) -> bytes:
+        """
+        Reads the header record
+
+        Returns:
+            bytes: Raw header record
+        """
+        self._fin.seek(0)
+        self._next_offset = self.recordsize
+        return self._fin.read(self.recordsize)
+
+    def read(self, start: int, stop: int) -> bytes | memoryview:
+        """
+        Reads records of SNPs "start" to "stop" (exclusive)
+
+        Args:
+            start (int): Index of the first SNP to read
+            stop (int): Index after the last SNP to read
+
+        Returns:
+            bytes | memoryview: Raw records. A zero-copy memoryview if the file is memory mapped
+        """
+        offset = (1 + start) * self.recordsize
+        if self.instr is not None:
+            self.instr.count("bytes_read", (stop - start) * self.recordsize)
+            if self._view is None and offset != self._next_offset:
+                self.instr.count("seeks", 1)
+            self._next_offset = (1 + stop) * self.recordsize
+        if self._view is not None:
+            return self._view[offset:(1 + stop) * self.recordsize]
+        self._fin.seek(offset)
+        return self._fin.read((stop - start) * self.recordsize)
+
+    def read_span(self, start: int, stop: int, byte_start: int, byte_stop: int) -> bytes:
+        """
+        Reads bytes "byte_start" to "byte_stop" (exclusive) of records "start" to "stop" (exclusive), a 2-D tile of the file
+
+        Args:
+            start (int): Index of the first record to read
+            stop (int): Index after the last record to read
+            byte_start (int): Offset of the first byte to read within every record
+            byte_stop (int): Offset after the last byte to read within every record
+
+        Returns:
+            bytes: Byte range of every record, concatenated
+        """
+        rs = self.recordsize
+        if byte_start == 0 and byte_stop == rs:
+            return bytes(self.read(start, stop))
+        width = byte_stop - byte_start
+        offsets = range((1 + start) * rs + byte_start, (1 + stop) * rs, rs)
+        if self.instr is not None:
+            self.instr.count("bytes_read", (stop - start) * width)
+            if self._view is None:
+                self.instr.count("seeks", stop - start)
+            self._next_offset = (1 + stop) * rs
+        if self._view is not None:
+            return b"".join([self._view[offset:offset + width] for offset in offsets])
+        if hasattr(os, "pread"):
+            fd = self._fin.fileno()
+            return b"".join([os.pread(fd, width, offset) for offset in offsets])
+        parts = []
+        for offset in offsets:
+            self._fin.seek(offset)
+            parts.append(self._fin.read(width))
+        return b"".join(parts)
+
+    def close(self) -> None:
+        """
+        Closes the file and memory map
+        """
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:  # records still referenced by the caller
+                pass
+            self._mm = None
+        self._fin.close()
+
+
+def _map_chunk(store: _RecordStore, start: int, stop: int, n_ind: int,
+               ind_idx: (list[int] | None), func: Callable,
+               block_type: str):
+    """
+    Reads and decodes a range of SNPs and applies a function to the decoded block. Used by PackedAncestryMap.map_reduce
+
+    Args:
+        store (_RecordStore): Record access to the ".geno" file
+        start (int): Index of the first SNP of the chunk
+        stop (int): Index after the last SNP of the chunk
+        n_ind (int): Number of individuals in the ".geno" file
+        ind_idx (list | None): Indices of the individuals to decode. All individuals are decoded if None
+        func (Callable): Function called as func(block, start)
+        block_type (str): Either "numpy", "list", or "raw"
+
+    Returns:
+        Any: Output of "func"
+    """
+    buf = store.read(start, stop)
+    if block_type == "raw":
+        block = bytes(buf)
+    elif block_type == "numpy":
+        block = _decode_block(buf, stop - start, store.recordsize, n_ind,
+                              ind_idx=ind_idx)
+    else:
+        ind_plan = None if ind_idx is None else [(i >> 2, i & 3) for i in ind_idx]
+        rs = store.recordsize
+        block = [_decode_record(buf[i * rs:(i + 1) * rs], n_ind, ind_plan)
+                 for i in range(stop - start)]
+    return func(block, start)
+
+
 class PackedAncestryMap:
     """
     Iterator class for PackedAncestryMap file.  Iterates through the file on a variant by variant basis.
+    Block-compressed ".geno" files are detected and read transparently, decompressing only the blocks that are accessed.
 
     Attributes:
         snp_info (SNP_Info): Object storing associated SNP info for PackedAncestryMap file
-        ind_info (Ind_Info): Object storing associated individual info for PackedAncestryMap file
+        ind_info (Ind_Info): Object storing associated individual info for PackedAncestryMap file. Only holds the selected individuals if "ind_selection" was given
         geno (list): Allelic dosages for the current SNP. Starts off as an array of zeros when at header record
-        _fin (IO[bytes]): Binary file object for PackedAncestryMap
+        _store (_RecordStore | _CompressedStore): Record access to the PackedAncestryMap file
         _filesize (int): Size of file in bytes
         _recordsize (int): Size of individual SNP record in bytes
         _recordbits (int): Size of individual SNP record in bits
+        _recordbytes (int): Number of bytes of a SNP record holding dosages, excluding trailing padding
+        _nind (int): Number of individuals in the PackedAncestryMap file
+        _ind_idx (list | None): Indices of the selected individuals. None if all individuals are read
+        _ind_plan (list | None): Byte offset and position within byte of every selected individual's dosage
+        _prefetcher (_Prefetcher | None): Background reader used during iteration. None if prefetching is disabled
+        _instr (_Instrumentation | None): Counters and phase timings. None if instrumentation is disabled
         _HEADER (str): File header of PackedAncestryMap
         _i_snp (int): Index of current SNP. Set to -1 at header record
     """
     def __init__(self, geno_file: (str | None) = None,
                  ind_file: (str | None) = None, snp_file: (str | None) = None,
                  file_prefix: (str | None) = None, check_hash: bool = True,
-                 check_size: bool = True) -> None:
+                 check_size: bool = True, use_mmap: bool = False,
+                 ind_selection: (list[int] | set[str] | str | Ind_Info | None) = None,
+                 use_cache: bool = False, prefetch: bool = False,
+                 prefetch_depth: int = 4, prefetch_size: int = 1 << 22,
+                 instrument: bool = False,
+                 hooks: (list[Callable] | None) = None) -> None:
         """
         Initialization method for PackedAncestryMap object.
 
@@ -335,6 +816,14 @@ class PackedAncestryMap:
             file_prefix (str, optional): Prefix for all PackedAncestryMap files. Will read ".ind", ".snp", and ".geno" files. Cannot be used alongside "geno_file", "ind_file", or "snp_file" parameters
             check_hash (bool): If True the hash of the object will be checked to see if it matches what hash is expected.
             check_size (bool): If True the lengths of the ".ind" and ".snp" files will be compared with those expected by the header of the PackedAncestryMap file
+            use_mmap (bool): If True the ".geno" file is memory mapped. Records are then served as zero-copy memoryview slices, the file stays open after iteration ends, and the object can be shared read-only across forked processes. Ignored for compressed ".geno" files
+            ind_selection (list | set | str | Ind_Info, optional): Only decode a subset of individuals. Either a list of indices, a label or set of labels, or an Ind_Info object whose individuals are a subset of the ".ind" file
+            use_cache (bool): If True the parsed ".snp" and ".ind" files are loaded from, or saved to, binary ".eigcache" sidecar files
+            prefetch (bool): If True a background thread reads records ahead of iteration in large chunks, overlapping I/O with decoding. Ignored if "use_mmap" is True or the ".geno" file is compressed
+            prefetch_depth (int): Number of chunk buffers the background thread may fill ahead of iteration
+            prefetch_size (int): Size of each chunk buffer in bytes
+            instrument (bool): If True bytes read, seeks, records decoded and wall time per phase are recorded and available through "stats"
+            hooks (list, optional): Callables called as hook(name, value) on every instrumentation update. Only used if "instrument" is True
         """
         paramter_error_msg = "Inappropriate parametrization. Either only provide a 'file_prefix' parameter or provide parameters for each individual PACKEDANCESTRYMAP file component"
         # parameter handling to allow for init polymorphism
@@ -350,15 +839,33 @@ class PackedAncestryMap:
                 geno_file = file_prefix + ".geno"
                 ind_file = file_prefix + ".ind"
                 snp_file = file_prefix + ".snp"
-        self.snp_info = SNP_Info(snp_file)
-        self.ind_info = Ind_Info(ind_file)
-        self._fin = open(geno_file, "rb")
+        self._instr = _Instrumentation(hooks) if instrument else None
+        start = perf_counter()
+        self.snp_info = SNP_Info(snp_file, use_cache)
+        self.ind_info = Ind_Info(ind_file, use_cache)
+        if self._instr is not None:
+            self._instr.add_time("metadata", perf_counter() - start)
         self._filesize = os.path.getsize(geno_file)
-        self._recordsize = self._filesize / (len(self.snp_info) + 1)
-        assert self._recordsize == floor(self._recordsize)
-        self._recordsize = int(self._recordsize)
+        if is_compressed(geno_file):
+            self._store = _CompressedStore(geno_file)
+            self._recordsize = self._store.recordsize
+        else:
+            self._recordsize = self._filesize / (len(self.snp_info) + 1)
+            assert self._recordsize == floor(self._recordsize)
+            self._recordsize = int(self._recordsize)
+            self._store = _RecordStore(geno_file, self._recordsize, use_mmap)
         self._recordbits = self._recordsize * 8
-        raw_header = self._fin.read(self._recordsize).decode()
+        self._recordbytes = ceil(len(self.ind_info) / 4)
+        self._nind = len(self.ind_info)
+        self._store.instr = self._instr
+        self._prefetcher = None
+        if prefetch and not self._store.use_mmap and not self._store.compressed:
+            self._prefetcher = _Prefetcher(geno_file, self._recordsize, len(self.snp_info),
+                                           prefetch_size // self._recordsize, prefetch_depth)
+            self._prefetcher.instr = self._instr
+            weakref.finalize(self, self._prefetcher.close)
+        start = perf_counter()
+        raw_header = self._store.read_header().decode()
         # check that header string is in proper format
         if not raw_header.startswith("GENO"):
             raise Exception("Improper .geno filetype")
@@ -371,14 +878,31 @@ class PackedAncestryMap:
         snp_hash = int(header_elems[4], 16)
         self._i_snp = -1
         self.geno = [0] * len(self.ind_info)
-        if (check_hash) & (ind_hash != self.ind_info._hash):
-            raise Exception(".ind file hash mismatch. Calculated hash of %x does not match expected hash of %x" % (self.ind_info._hash, ind_hash))
-        if (check_hash) & (snp_hash != self.snp_info._hash):
-            raise Exception(".snp file hash mismatch. Calculated hash of %x does not match expected hash of %x" % (self.snp_info._hash, snp_hash))
+        if self._instr is not None:
+            self._instr.add_time("header", perf_counter() - start)
+            start = perf_counter()
+        if check_hash:
+            # hashes are computed lazily, here so that they are timed as their own phase
+            ind_hash_calc = self.ind_info._hash
+            snp_hash_calc = self.snp_info._hash
+        if self._instr is not None:
+            self._instr.add_time("hash", perf_counter() - start)
+        if check_hash and (ind_hash != ind_hash_calc):
+            raise Exception(".ind file hash mismatch. Calculated hash of %x does not match expected hash of %x" % (ind_hash_calc, ind_hash))
+        if check_hash and (snp_hash != snp_hash_calc):
+            raise Exception(".snp file hash mismatch. Calculated hash of %x does not match expected hash of %x" % (snp_hash_calc, snp_hash))
         if (check_size) & (n_ind != len(self.ind_info)):
             raise Exception("Number of individuals in .ind file (n=%i) different from what is expected by .geno file (n=%i)" % (len(self.ind_info), n_ind))
         if (check_size) & (n_snp != len(self.snp_info)):
             raise Exception("Number of SNPs in .snp file (m=%i) different from what is expected by .geno file (m=%i)" % (len(self.snp_info), n_snp))
+        # restrict decoding to the bytes holding the selected individuals
+        self._ind_idx = None
+        self._ind_plan = None
+        if ind_selection is not None:
+            self._ind_idx = _resolve_ind_selection(self.ind_info, ind_selection)
+            self._ind_plan = [(i >> 2, i & 3) for i in self._ind_idx]
+            self.ind_info = self.ind_info[self._ind_idx]
+            self.geno = [0] * len(self.ind_info)
 
     def __iter__(self) -> None:
         """
@@ -400,18 +924,51 @@ class PackedAncestryMap:
             return None
         return self.snp_info[self._i_snp]
 
-    def _read_record(self) -> None:
+    def __getitem__(self, index: int) -> bytes | memoryview:
+        """
+        Gets the raw packed record of the SNP at a given index without decoding it or moving the iterator
+
+        Args:
+            index (int): Index of the SNP
+
+        Returns:
+            bytes | memoryview: Raw record. A zero-copy memoryview of the mapped file if "use_mmap" is True
         """
-        Reads dosages of current SNP record and saves it to the "geno" attribute
+        n_snp = len(self.snp_info)
+        if index < 0:
+            index += n_snp
+        if not (0 <= index < n_snp):
+            raise IndexError("SNP index out of range")
+        return self._store.read(index, index + 1)
+
+    def _read_record(self, i_snp: int) -> None:
         """
-        rsb = self._recordbits
-        snp_record = int.from_bytes(self._fin.read(self._recordsize))
-        bit_mask = (2 ** rsb) - 1
-        for i in range(len(self.ind_info)):
-            dos_tmp = (snp_record << (self._recordbits - rsb)) & bit_mask
-            dos_tmp = dos_tmp >> (self._recordbits - 2)
-            self.geno[i] = GENO_MAP[dos_tmp]
-            rsb -= 2
+        Reads dosages of a SNP record and saves it to the "geno" attribute.
+
+        Each byte is unpacked into its four dosages with a single lookup in a
+        precomputed 256-entry table, so decoding is linear in the number of
+        individuals. Target throughput is at least 2,000 SNPs per second for
+        10,000 individuals on a single core.
+
+        Args:
+            i_snp (int): Index of the SNP to read
+        """
+        self._set_geno(self._store.read(i_snp, i_snp + 1))
+
+    def _set_geno(self, snp_record: bytes) -> None:
+        """
+        Decodes a raw SNP record into the "geno" attribute
+
+        Args:
+            snp_record (bytes): Raw SNP record
+        """
+        if self._instr is None:
+            self.geno[:] = _decode_record(snp_record, self._nind, self._ind_plan)
+            return
+        start = perf_counter()
+        self.geno[:] = _decode_record(snp_record, self._nind, self._ind_plan)
+        self._instr.add_time("decode", perf_counter() - start)
+        self._instr.count("records_decoded", 1)
 
     def __next__(self) -> Self:
         """
@@ -421,12 +978,202 @@ class PackedAncestryMap:
             PackedAncestryMap: PackedAncestryMap object at the next SNP
         """
         if self._i_snp == (len(self.snp_info) - 1):
-            self._fin.close()
+            if not self._store.use_mmap:
+                self.close()
             raise StopIteration
-        self._read_record()
+        if self._prefetcher is not None:
+            self._set_geno(self._prefetcher.record(self._i_snp + 1))
+        else:
+            self._read_record(self._i_snp + 1)
         self._i_snp += 1
         return self
 
+    def close(self) -> None:
+        """
+        Closes the underlying ".geno" file and stops any prefetching thread
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+        self._store.close()
+
+    def stats(self) -> (dict | None):
+        """
+        Gets instrumentation counters and cumulative wall time per phase
+
+        Returns:
+            dict | None: Counters ("bytes_read", "records_decoded", "seeks", ...) and phase times ("metadata_seconds", "hash_seconds", "header_seconds", "decode_seconds", ...). None if instrumentation is disabled
+        """
+        if self._instr is None:
+            return None
+        return self._instr.snapshot()
+
+    def __enter__(self) -> Self:
+        """
+        Enters a context in which the PackedAncestryMap file is open
+
+        Returns:
+            PackedAncestryMap: returns itself
+        """
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Closes the PackedAncestryMap file when leaving the context
+        """
+        self.close()
+
+    def read_block(self, start: int, stop: int, dtype: str = "int8",
+                   missing: int = -1):
+        """
+        Reads the dosages of SNPs "start" to "stop" (exclusive) into a matrix with a single bulk read. Requires NumPy. The position of the iterator is left unchanged.
+
+        Args:
+            start (int): Index of the first SNP to read
+            stop (int): Index after the last SNP to read
+            dtype (str): NumPy dtype of the returned matrix. Usually "int8" or "uint8"
+            missing (int): Value used for missing dosages. Must be representable in "dtype", for instance 3 rather than -1 for "uint8"
+
+        Returns:
+            numpy.ndarray: Dosage matrix of shape (stop - start, number of individuals)
+        """
+        if np is None:
+            raise ImportError("NumPy is required for read_block")
+        if not (0 <= start <= stop <= len(self.snp_info)):
+            raise IndexError("SNP range [%i, %i) out of bounds" % (start, stop))
+        buf = self._store.read(start, stop)
+        decode_start = perf_counter() if self._instr is not None else 0.0
+        block = _decode_block(buf, stop - start, self._recordsize, self._nind,
+                              dtype, missing, self._ind_idx)
+        if self._instr is not None:
+            self._instr.add_time("decode", perf_counter() - decode_start)
+            self._instr.count("records_decoded", stop - start)
+        return block
+
+    def map_reduce(self, func: Callable, reducer: Callable,
+                   n_workers: (int | None) = None, chunk_size: int = 10000,
+                   block_type: Literal["auto", "numpy", "list", "raw"] = "auto"):
+        """
+        Splits the SNPs into chunks, decodes each chunk in a pool of worker processes and combines the results.
+        Every worker opens the ".geno" file independently. The position of the iterator is left unchanged.
+
+        Args:
+            func (Callable): Picklable function called as func(block, start) on every chunk, where "start" is the index of the first SNP of the chunk
+            reducer (Callable): Function combining two results, applied to the chunk results in SNP order
+            n_workers (int, optional): Number of worker processes. Defaults to the number of CPUs. Chunks are processed in the current process if 1
+            chunk_size (int): Number of SNPs per chunk
+            block_type (str): Type of block passed to "func". "numpy" gives an int8 matrix with -1 for missing dosages, "list" gives a list of dosage lists like the "geno" attribute, "raw" gives the packed records of the chunk for all individuals. "auto" uses "numpy" if NumPy is installed and "list" otherwise
+
+        Returns:
+            Any: Reduced result. None if there are no SNPs
+        """
+        if block_type == "auto":
+            block_type = "list" if np is None else "numpy"
+        if block_type == "numpy" and np is None:
+            raise ImportError("NumPy is required for block_type=\"numpy\"")
+        n_snp = len(self.snp_info)
+        starts = range(0, n_snp, chunk_size)
+        stops = [min(start + chunk_size, n_snp) for start in starts]
+        args = (self._nind, self._ind_idx, func, block_type)
+        if not starts:
+            return None
+        # results are folded into the reducer as they arrive, in SNP order, rather than collected first
+        if n_workers == 1:
+            return reduce(reducer, (_map_chunk(self._store, start, stop, *args)
+                                    for start, stop in zip(starts, stops)))
+        with ProcessPoolExecutor(n_workers) as executor:
+            return reduce(reducer, executor.map(
+                _map_chunk, [self._store] * len(starts), starts, stops,
+                *[[arg] * len(starts) for arg in args]))
+
+    def _read_indices(self, indices: list[int], as_array: bool = False,
+                      dtype: str = "int8", missing: int = -1,
+                      max_gap: int = 0):
+        """
+        Reads the dosages of several SNPs, merging neighbouring records into single bulk reads. The position of the iterator is left unchanged.
+
+        Args:
+            indices (list): Sorted, unique indices of the SNPs to read
+            as_array (bool): If True returns a NumPy matrix, as "read_block" does, rather than a list of dosage lists
+            dtype (str): NumPy dtype of the returned matrix
+            missing (int): Value used for missing dosages in the returned matrix
+            max_gap (int): Maximum number of unused records read between two requested records of the same bulk read
+
+        Returns:
+            list | numpy.ndarray: Dosages of the SNPs, in the order of "indices"
+        """
+        if as_array and np is None:
+            raise ImportError("NumPy is required for as_array=True")
+        rs = self._recordsize
+        blocks = []
+        for start, stop in _coalesce(indices, max_gap):
+            buf = self._store.read(start, stop)
+            wanted = [i - start for i in
+                      indices[bisect_left(indices, start):bisect_left(indices, stop)]]
+            decode_start = perf_counter() if self._instr is not None else 0.0
+            if as_array:
+                block = _decode_block(buf, stop - start, rs, self._nind, dtype,
+                                      missing, self._ind_idx)
+                blocks.append(block if len(wanted) == stop - start else block[wanted])
+            else:
+                blocks.append([_decode_record(buf[i * rs:(i + 1) * rs], self._nind,
+                                              self._ind_plan)
+                               for i in wanted])
+            if self._instr is not None:
+                self._instr.add_time("decode", perf_counter() - decode_start)
+                self._instr.count("records_decoded", len(wanted))
+        if as_array:
+            if not blocks:
+                return np.empty((0, len(self.ind_info)), dtype=dtype)
+            return np.concatenate(blocks)
+        return list(chain.from_iterable(blocks))
+
+    def fetch(self, chrom: str, start: int, end: int, as_array: bool = False,
+              dtype: str = "int8", missing: int = -1) -> tuple:
+        """
+        Reads the SNPs within a genomic region. Positions are looked up with binary search and contiguous records are read with a single bulk read. Files that are not sorted by position are read in as few contiguous runs as possible. The position of the iterator is left unchanged.
+
+        Args:
+            chrom (str): Chromosome of the region
+            start (int): First position of the region
+            end (int): Last position of the region (inclusive)
+            as_array (bool): If True the dosages are returned as a NumPy matrix, as "read_block" does, rather than a list of dosage lists
+            dtype (str): NumPy dtype of the returned matrix
+            missing (int): Value used for missing dosages in the returned matrix
+
+        Returns:
+            tuple: SNP_Info of the SNPs in the region, in file order, and their dosages
+        """
+        indices = self.snp_info.get_region_indices(chrom, start, end)
+        return (self.snp_info[indices],
+                self._read_indices(indices, as_array, dtype, missing))
+
+    def fetch_many(self, var_names: list[str], max_gap: int = 16,
+                   as_array: bool = False, dtype: str = "int8",
+                   missing: int = -1) -> tuple:
+        """
+        Reads many SNPs by name. Records are read in file order, with records at most "max_gap" records apart merged into a single bulk read, and returned in the order requested. The position of the iterator is left unchanged.
+
+        Args:
+            var_names (list): Names of the variants to read
+            max_gap (int): Maximum number of unused records read between two requested records of the same bulk read
+            as_array (bool): If True the dosages are returned as a NumPy matrix, as "read_block" does, rather than a list of dosage lists
+            dtype (str): NumPy dtype of the returned matrix
+            missing (int): Value used for missing dosages in the returned matrix
+
+        Returns:
+            tuple: SNP_Info of the requested SNPs and their dosages, both in the order of "var_names"
+        """
+        requested = [self.snp_info.get_var_name_idx(var_name) for var_name in var_names]
+        indices = sorted(set(requested))
+        rank = {i: k for k, i in enumerate(indices)}
+        order = [rank[i] for i in requested]
+        dosages = self._read_indices(indices, as_array, dtype, missing, max_gap)
+        if as_array:
+            dosages = dosages[order]
+        else:
+            dosages = [dosages[k] for k in order]
+        return self.snp_info[requested], dosages
+
     def goto_snp(self, var_name: str) -> None:
         """
         Goes to specified SNP location and reads record to "geno" attribute
@@ -435,6 +1182,5 @@ class PackedAncestryMap:
             var_name (str): name of the variant whose record will be read
         """
         i_var = self.snp_info.get_var_name_idx(var_name)
-        self._fin.seek((1 + i_var) * self._recordsize)
-        self._read_record()
+        self._read_record(i_var)
         self._i_snp = i_var
@@ -0,0 +1,64 @@
+from typing import Callable
+
+
+COUNTERS = ("bytes_read", "bytes_written", "records_decoded", "records_encoded",
+            "seeks")
+PHASES = ("metadata", "hash", "header", "decode", "encode", "flush")
+
+
+class _Instrumentation:
+    """
+    Counters and cumulative wall time per phase for PackedAncestryMap readers and writers.
+    Objects only hold a _Instrumentation when instrumentation is enabled, so disabled instrumentation costs a single None check.
+
+    Attributes:
+        counters (dict): Value of every counter in COUNTERS
+        phase_times (dict): Cumulative wall time in seconds of every phase in PHASES
+        hooks (list): Callables called as hook(name, value) on every update, "name" being a counter or a phase
+    """
+    def __init__(self, hooks: (list[Callable] | None) = None) -> None:
+        """
+        Initializes _Instrumentation object.
+
+        Args:
+            hooks (list, optional): Callables called as hook(name, value) on every update
+        """
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.hooks = list(hooks) if hooks is not None else []
+
+    def count(self, counter: str, value: int) -> None:
+        """
+        Increments a counter
+
+        Args:
+            counter (str): Name of the counter
+            value (int): Increment
+        """
+        self.counters[counter] += value
+        for hook in self.hooks:
+            hook(counter, value)
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        """
+        Adds wall time to a phase
+
+        Args:
+            phase (str): Name of the phase
+            seconds (float): Wall time in seconds
+        """
+        self.phase_times[phase] += seconds
+        for hook in self.hooks:
+            hook(phase, seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Gets the current counters and phase times
+
+        Returns:
+            dict: Counters, followed by phase times under "<phase>_seconds" keys
+        """
+        out = dict(self.counters)
+        for phase, seconds in self.phase_times.items():
+            out[phase + "_seconds"] = seconds
+        return out
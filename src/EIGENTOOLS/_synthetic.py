@@ -0,0 +1,84 @@
+import random
+from EIGENTOOLS._read import SNP_Info, Ind_Info
+from EIGENTOOLS._write import PackedAncestryMapWriter
+
+
+def _genotype_table(freq: float, missing_rate: float) -> bytes:
+    """
+    Builds a translation table turning uniformly random bytes into 2-bit genotype codes under Hardy-Weinberg equilibrium.
+    Probabilities are quantized to multiples of 1/256
+
+    Args:
+        freq (float): Frequency of the reference allele
+        missing_rate (float): Probability of a missing genotype
+
+    Returns:
+        bytes: Translation table mapping every byte to a code of 0, 1, 2, or 3 (missing)
+    """
+    called = 1 - missing_rate
+    probs = (called * (1 - freq) ** 2, called * 2 * freq * (1 - freq), called * freq ** 2)
+    table = bytearray([3] * 256)
+    start = 0
+    cumulative = 0.0
+    for code, prob in enumerate(probs):
+        cumulative += prob
+        stop = min(256, round(cumulative * 256))
+        table[start:stop] = bytes([code]) * (stop - start)
+        start = max(start, stop)
+    return bytes(table)
+
+
+def write_synthetic(file_prefix: str, n_ind: int, n_snp: int,
+                    missing_rate: float = 0.01,
+                    freq_range: tuple[float, float] = (0.05, 0.95),
+                    n_labels: int = 4, label_drift: float = 0.1,
+                    n_chrom: int = 22, seed: int = 0) -> None:
+    """
+    Writes a deterministic synthetic PackedAncestryMap dataset with valid header hashes. Individuals are split into
+    "n_labels" equally sized populations named "POP1", "POP2", ..., whose allele frequencies drift independently from
+    a shared frequency drawn uniformly from "freq_range". SNPs are spread evenly over "n_chrom" chromosomes.
+
+    Args:
+        file_prefix (str): Prefix of the ".geno", ".snp", and ".ind" files to write
+        n_ind (int): Number of individuals
+        n_snp (int): Number of SNPs
+        missing_rate (float): Probability of a missing genotype
+        freq_range (tuple): Range of the shared reference allele frequency
+        n_labels (int): Number of population labels
+        label_drift (float): Maximum absolute deviation of a population's allele frequency from the shared frequency
+        n_chrom (int): Number of chromosomes
+        seed (int): Seed of the random number generator. The same parameters and seed always produce the same files
+    """
+    rnd = random.Random(seed)
+    label_sizes = [n_ind // n_labels + (k < n_ind % n_labels) for k in range(n_labels)]
+    with open(file_prefix + ".ind", "w+") as f:
+        i = 0
+        for k, size in enumerate(label_sizes):
+            for _ in range(size):
+                f.write("SYN%i\t%s\tPOP%i\n" % (i, "MF"[i % 2], k + 1))
+                i += 1
+    snps_per_chrom = -(-n_snp // n_chrom) if n_snp else 1
+    with open(file_prefix + ".snp", "w+") as f:
+        for i in range(n_snp):
+            pos = 1000 * (1 + i % snps_per_chrom) + rnd.randrange(1000)
+            ref, alt = rnd.sample("ACGT", 2)
+            f.write("syn_rs%i\t%i\t%.6f\t%i\t%s\t%s\n" %
+                    (i, 1 + i // snps_per_chrom, pos * 1e-8, pos, ref, alt))
+
+    writer = PackedAncestryMapWriter(SNP_Info(file_prefix + ".snp"),
+                                     Ind_Info(file_prefix + ".ind"),
+                                     file_prefix=file_prefix, write_snp=False,
+                                     write_ind=False)
+    batch = []
+    for _ in range(n_snp):
+        freq = rnd.uniform(*freq_range)
+        codes = []
+        for size in label_sizes:
+            label_freq = min(1.0, max(0.0, freq + rnd.uniform(-label_drift, label_drift)))
+            codes.append(rnd.randbytes(size).translate(_genotype_table(label_freq, missing_rate)))
+        batch.append(b"".join(codes))
+        if len(batch) == 1024:
+            writer.write_records(batch)
+            batch = []
+    writer.write_records(batch)
+    writer.close()
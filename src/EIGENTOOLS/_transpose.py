@@ -0,0 +1,319 @@
+import os
+from math import ceil, floor, isqrt
+from typing import Self
+
+from EIGENTOOLS._compress import _CompressedStore, is_compressed
+from EIGENTOOLS._read import (SNP_Info, Ind_Info, PackedAncestryMap, _RecordStore,
+                              _decode_record, _decode_block, _expand_codes)
+from EIGENTOOLS._write import PackedAncestryMapWriter, _pack_codes
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+class TransposedAncestryMap:
+    """
+    Iterator class for transposed PackedAncestryMap ("TGENO") file. Iterates through the file on an individual by individual basis.
+    Records are individual-major, so reading every SNP of an individual costs a single record of ceil(n_snp / 4) bytes.
+
+    Attributes:
+        snp_info (SNP_Info): Object storing associated SNP info for the file
+        ind_info (Ind_Info): Object storing associated individual info for the file
+        geno (list): Allelic dosages of the current individual at every SNP. Starts off as an array of zeros when at header record
+        _store (_RecordStore | _CompressedStore): Record access to the TGENO file
+        _filesize (int): Size of file in bytes
+        _recordsize (int): Size of individual record in bytes
+        _nsnp (int): Number of SNPs in the file
+        _name_to_idx (dict | None): Reverse index for individual names. None until first needed
+        _HEADER (str): File header of the TGENO file
+        _i_ind (int): Index of current individual. Set to -1 at header record
+    """
+    def __init__(self, geno_file: (str | None) = None,
+                 ind_file: (str | None) = None, snp_file: (str | None) = None,
+                 file_prefix: (str | None) = None, check_hash: bool = True,
+                 check_size: bool = True, use_mmap: bool = False,
+                 use_cache: bool = False) -> None:
+        """
+        Initialization method for TransposedAncestryMap object.
+
+        Args:
+            geno_file (str, optional): Input TGENO file, cannot be used alongside "file_prefix" parameter
+            ind_file (str, optional): Input .ind file, cannot be used alongside "file_prefix" parameter
+            snp_file (str, optional): Input .snp file, cannot be used alongside "file_prefix" parameter
+            file_prefix (str, optional): Prefix for all files. Will read ".ind", ".snp", and ".geno" files. Cannot be used alongside "geno_file", "ind_file", or "snp_file" parameters
+            check_hash (bool): If True the hash of the object will be checked to see if it matches what hash is expected.
+            check_size (bool): If True the lengths of the ".ind" and ".snp" files will be compared with those expected by the header of the TGENO file
+            use_mmap (bool): If True the TGENO file is memory mapped and records are served as zero-copy memoryview slices. Ignored for compressed TGENO files
+            use_cache (bool): If True the parsed ".snp" and ".ind" files are loaded from, or saved to, binary ".eigcache" sidecar files
+        """
+        paramter_error_msg = "Inappropriate parametrization. Either only provide a 'file_prefix' parameter or provide parameters for each individual TGENO file component"
+        # parameter handling to allow for init polymorphism
+        if file_prefix is None:
+            if not ((geno_file is not None) and (ind_file is not None) and
+                    (snp_file is not None)):
+                raise TypeError(paramter_error_msg)
+        else:
+            if not ((geno_file is None) and (ind_file is None) and
+                    (snp_file is None)):
+                raise TypeError(paramter_error_msg)
+            else:
+                geno_file = file_prefix + ".geno"
+                ind_file = file_prefix + ".ind"
+                snp_file = file_prefix + ".snp"
+        self.snp_info = SNP_Info(snp_file, use_cache)
+        self.ind_info = Ind_Info(ind_file, use_cache)
+        self._filesize = os.path.getsize(geno_file)
+        if is_compressed(geno_file):
+            self._store = _CompressedStore(geno_file)
+            self._recordsize = self._store.recordsize
+        else:
+            self._recordsize = self._filesize / (len(self.ind_info) + 1)
+            assert self._recordsize == floor(self._recordsize)
+            self._recordsize = int(self._recordsize)
+            self._store = _RecordStore(geno_file, self._recordsize, use_mmap)
+        self._nsnp = len(self.snp_info)
+        self._name_to_idx = None
+        raw_header = self._store.read_header().decode()
+        # check that header string is in proper format
+        if not raw_header.startswith("TGENO"):
+            raise Exception("Improper TGENO filetype")
+        self._HEADER = raw_header.replace(chr(0), "")  # remove NULL chars
+        # perform optional checks
+        header_elems = self._HEADER.split()
+        n_ind = int(header_elems[1])
+        n_snp = int(header_elems[2])
+        ind_hash = int(header_elems[3], 16)
+        snp_hash = int(header_elems[4], 16)
+        self._i_ind = -1
+        self.geno = [0] * self._nsnp
+        if (check_hash) & (ind_hash != self.ind_info._hash):
+            raise Exception(".ind file hash mismatch. Calculated hash of %x does not match expected hash of %x" % (self.ind_info._hash, ind_hash))
+        if (check_hash) & (snp_hash != self.snp_info._hash):
+            raise Exception(".snp file hash mismatch. Calculated hash of %x does not match expected hash of %x" % (self.snp_info._hash, snp_hash))
+        if (check_size) & (n_ind != len(self.ind_info)):
+            raise Exception("Number of individuals in .ind file (n=%i) different from what is expected by TGENO file (n=%i)" % (len(self.ind_info), n_ind))
+        if (check_size) & (n_snp != len(self.snp_info)):
+            raise Exception("Number of SNPs in .snp file (m=%i) different from what is expected by TGENO file (m=%i)" % (len(self.snp_info), n_snp))
+
+    def __iter__(self) -> Self:
+        """
+        Basic __iter__ method. Returns self.
+
+        Returns:
+            TransposedAncestryMap: returns itself
+        """
+        return self
+
+    def get_Ind_Info(self) -> Ind_Info:
+        """
+        Returns the Ind_Info object of the individual whose record the TransposedAncestryMap object is currently at
+
+        Returns:
+            Ind_Info: Ind_Info of length 1 indexed at the individual which the TransposedAncestryMap object is at
+        """
+        if self._i_ind < 0:
+            return None
+        return self.ind_info[self._i_ind]
+
+    def __getitem__(self, index: int) -> bytes | memoryview:
+        """
+        Gets the raw packed record of the individual at a given index without decoding it or moving the iterator
+
+        Args:
+            index (int): Index of the individual
+
+        Returns:
+            bytes | memoryview: Raw record. A zero-copy memoryview of the mapped file if "use_mmap" is True
+        """
+        n_ind = len(self.ind_info)
+        if index < 0:
+            index += n_ind
+        if not (0 <= index < n_ind):
+            raise IndexError("Individual index out of range")
+        return self._store.read(index, index + 1)
+
+    def _read_record(self, i_ind: int) -> None:
+        """
+        Reads dosages of an individual record and saves it to the "geno" attribute.
+
+        Args:
+            i_ind (int): Index of the individual to read
+        """
+        self.geno[:] = _decode_record(self._store.read(i_ind, i_ind + 1), self._nsnp)
+
+    def __next__(self) -> Self:
+        """
+        Moves to the next individual and reads its record
+
+        Returns:
+            TransposedAncestryMap: returns itself
+        """
+        if self._i_ind + 1 >= len(self.ind_info):
+            if not self._store.use_mmap:
+                self.close()
+            raise StopIteration
+        self._read_record(self._i_ind + 1)
+        self._i_ind += 1
+        return self
+
+    def close(self) -> None:
+        """
+        Closes the TGENO file
+        """
+        self._store.close()
+
+    def __enter__(self) -> Self:
+        """
+        Enters a context in which the TGENO file is open
+
+        Returns:
+            TransposedAncestryMap: returns itself
+        """
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """
+        Closes the TGENO file when leaving the context
+        """
+        self.close()
+
+    def read_block(self, start: int, stop: int, dtype: str = "int8",
+                   missing: int = -1):
+        """
+        Reads the dosages of individuals "start" to "stop" (exclusive) into a NumPy matrix with a single bulk read. The position of the iterator is left unchanged.
+
+        Args:
+            start (int): Index of the first individual
+            stop (int): Index after the last individual
+            dtype (str): NumPy dtype of the returned matrix
+            missing (int): Value used for missing dosages. Must be representable in "dtype", for instance 3 rather than -1 for "uint8"
+
+        Returns:
+            numpy.ndarray: Dosage matrix of shape (stop - start, number of SNPs)
+        """
+        if np is None:
+            raise ImportError("NumPy is required for read_block")
+        if not (0 <= start <= stop <= len(self.ind_info)):
+            raise IndexError("Individual range [%i, %i) out of bounds" % (start, stop))
+        buf = self._store.read(start, stop)
+        return _decode_block(buf, stop - start, self._recordsize, self._nsnp,
+                             dtype, missing)
+
+    def goto_ind(self, ind_name: str) -> None:
+        """
+        Goes to specified individual and reads record to "geno" attribute
+
+        Args:
+            ind_name (str): name of the individual whose record will be read
+        """
+        if self._name_to_idx is None:
+            self._name_to_idx = {name: i for i, name in enumerate(self.ind_info.ind_name)}
+        try:
+            i_ind = self._name_to_idx[ind_name]
+        except KeyError:
+            raise LookupError("Individual \"" + ind_name + "\" not found.")
+        self._read_record(i_ind)
+        self._i_ind = i_ind
+
+
+class TransposedAncestryMapWriter(PackedAncestryMapWriter):
+    """
+    Object designed for easy writing of a transposed PackedAncestryMap ("TGENO") file. This is done on an individual record basis:
+    "write_record" takes the dosages of one individual at every SNP, and "write_block" a matrix with one row per individual.
+    """
+    _HEADER_FORMAT = "TGENO %i %i %x %x"
+    _TRANSPOSED = True
+
+
+def _transpose_tile(buf: bytes, n_rows: int, recordsize: int, n_cols: int) -> list:
+    """
+    Transposes a tile of consecutive packed records
+
+    Args:
+        buf (bytes): Packed records of the tile
+        n_rows (int): Number of records in the tile
+        recordsize (int): Size of a record in bytes
+        n_cols (int): Number of dosages per record
+
+    Returns:
+        list: One packed row per dosage position, holding the "n_rows" codes of that position padded with zero bits to a whole number of bytes
+    """
+    if np is None:
+        codes = _expand_codes(buf)
+        stride = 4 * recordsize
+        return [_pack_codes(codes[col::stride]) for col in range(n_cols)]
+    packed = np.frombuffer(buf, dtype=np.uint8).reshape(n_rows, recordsize)
+    n_padded = ceil(n_rows / 4) * 4
+    # one code per byte, in file order, with zero codes padding the rows to a whole number of bytes
+    codes = np.zeros((n_padded, recordsize, 4), dtype=np.uint8)
+    for offset, shift in enumerate((6, 4, 2, 0)):
+        np.bitwise_and(packed >> shift, 3, out=codes[:n_rows, :, offset])
+    codes = codes.reshape(n_padded, 4 * recordsize)[:, :n_cols].T.reshape(n_cols, n_padded // 4, 4)
+    rows = ((codes[:, :, 0] << 6) | (codes[:, :, 1] << 4) |
+            (codes[:, :, 2] << 2) | codes[:, :, 3])
+    return [row.tobytes() for row in rows]
+
+
+def transpose(reader: PackedAncestryMap | TransposedAncestryMap,
+              geno_file: (str | None) = None, ind_file: (str | None) = None,
+              snp_file: (str | None) = None, file_prefix: (str | None) = None,
+              tile_size: int = 1 << 24) -> None:
+    """
+    Converts a PackedAncestryMap file to the transposed TGENO layout, or a TGENO file back to a PackedAncestryMap file.
+    The input is split into 2-D tiles, a range of records by a range of bytes within every record. Every tile is
+    transposed by 2-bit repacking and written straight to its place in the preallocated output, so memory use is bounded
+    by the tile size rather than the size of the file. Tiles span every input record where the tile size allows, in
+    which case they are whole output records written at once, and are square otherwise so that both the reads of a
+    tile and the writes of its rows stay large however wide the records are.
+
+    Args:
+        reader (PackedAncestryMap | TransposedAncestryMap): Input file. A PackedAncestryMap must not have an individual selection
+        geno_file (str, optional): Output .geno file, cannot be used alongside "file_prefix" parameter
+        ind_file (str, optional): Output .ind file, cannot be used alongside "file_prefix" parameter
+        snp_file (str, optional): Output .snp file, cannot be used alongside "file_prefix" parameter
+        file_prefix (str, optional): Prefix for all output files. Cannot be used alongside "geno_file", "ind_file", or "snp_file" parameters
+        tile_size (int): Approximate number of input bytes transposed at once
+    """
+    if isinstance(reader, TransposedAncestryMap):
+        writer_class = PackedAncestryMapWriter
+        n_rows, n_cols = len(reader.ind_info), len(reader.snp_info)
+    else:
+        if reader._ind_idx is not None:
+            raise ValueError("Input cannot have an individual selection.")
+        writer_class = TransposedAncestryMapWriter
+        n_rows, n_cols = len(reader.snp_info), len(reader.ind_info)
+    store = reader._store
+    # trailing bytes of the preallocated output records are left as zeros
+    writer = writer_class(reader.snp_info, reader.ind_info, geno_file, ind_file,
+                          snp_file, file_prefix, preallocate=True)
+    out_size = writer._recordsize
+    n_bytes = ceil(n_cols / 4)
+    # tile width in bytes of every input record, balanced so that the reads of a tile, "tile_bytes" bytes each, are as
+    # large as the writes of its rows, "tile_rows" / 4 bytes each, unless the tile spans every input record
+    tile_bytes = min(n_bytes, max(tile_size // max(n_rows, 1), isqrt(tile_size // 4), 1))
+    tile_bytes = ceil(n_bytes / ceil(n_bytes / tile_bytes)) if n_bytes else 1
+    tile_rows = max(4, tile_size // tile_bytes // 4 * 4)
+    full = tile_rows >= n_rows > 0
+    if store.compressed and not full:
+        # tiles within a compressed block share a single decompression of the block
+        tile_rows = min(tile_rows, max(4, store.block_records // 4 * 4))
+    for start in range(0, n_rows, tile_rows):
+        stop = min(start + tile_rows, n_rows)
+        for byte_start in range(0, n_bytes, tile_bytes):
+            byte_stop = min(byte_start + tile_bytes, n_bytes)
+            col = 4 * byte_start
+            n_tile_cols = min(4 * (byte_stop - byte_start), n_cols - col)
+            buf = store.read_span(start, stop, byte_start, byte_stop)
+            rows = _transpose_tile(buf, stop - start, byte_stop - byte_start, n_tile_cols)
+            if full:
+                writer._write_records_at(b"".join([row + writer._trailingbytes for row in rows]),
+                                         col, n_tile_cols)
+            else:
+                for k, row in enumerate(rows):
+                    writer._write_span_at(row, (1 + col + k) * out_size + start // 4)
+    if not full:
+        # output records are only complete once every tile is written
+        writer._mark_written(0, n_cols)
+    writer.close()
@@ -1,10 +1,144 @@
+from contextlib import nullcontext
 from math import ceil, nan, isnan
+from EIGENTOOLS._compress import _BlockCompressor
 from EIGENTOOLS._read import SNP_Info, Ind_Info
-from typing import Literal
+from EIGENTOOLS._stats import _Instrumentation
+from time import perf_counter
+from typing import IO, Callable, Literal
+import os
+import threading
 import warnings
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
 
 val_map = {0: 0, 1: 1, 2: 2, nan: 3}
+# translation tables moving a 2-bit code to its position within a packed byte
+_SHIFT_TABLES = [bytes((b & 3) << shift for b in range(256))
+                 for shift in (6, 4, 2)]
+_BUFFER_SIZE = 1 << 22
+PROGRESS_SUFFIX = ".progress"
+
+
+def _write_at(f, data: bytes, offset: int) -> None:
+    """
+    Writes bytes at a given offset of a file, without moving its position where os.pwrite is available
+
+    Args:
+        f (IO[bytes]): Binary file object. Must be flushed
+        data (bytes): Bytes to write
+        offset (int): Byte offset in the file
+    """
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            n_written = os.pwrite(f.fileno(), view, offset)
+            view = view[n_written:]
+            offset += n_written
+    else:
+        f.seek(offset)
+        f.write(data)
+        f.flush()
+
+
+def _missing_runs(progress: bytes) -> list[tuple[int, int]]:
+    """
+    Finds the records a preallocated file is still missing
+
+    Args:
+        progress (bytes): Progress map, one byte per record set to 1 once the record is written
+
+    Returns:
+        list: Runs of missing records as (start, stop) pairs, "stop" being exclusive
+    """
+    runs = []
+    start = progress.find(0)
+    while start != -1:
+        stop = progress.find(1, start)
+        if stop == -1:
+            stop = len(progress)
+        runs.append((start, stop))
+        start = progress.find(0, stop)
+    return runs
+
+
+def _dosage_codes(dosage_list) -> bytes:
+    """
+    Converts allelic dosages to 2-bit codes, stored one code per byte
+
+    Args:
+        dosage_list (list | bytes): Allelic dosages (0, 1, 2, or nan). Bytes-like objects are taken to already hold codes, with 3 marking a missing dosage
+
+    Returns:
+        bytes: One code per dosage
+    """
+    if isinstance(dosage_list, (bytes, bytearray, memoryview)):
+        codes = bytes(dosage_list)
+        if codes.translate(None, b"\x00\x01\x02\x03"):
+            raise ValueError("Dosage codes must either be 0,1,2, or 3.")
+        return codes
+    try:
+        return bytes(map(val_map.__getitem__, dosage_list))
+    except (KeyError, TypeError):
+        pass
+    # slow path, normalizing nan instances
+    codes = bytearray(len(dosage_list))
+    for i, v in enumerate(dosage_list):
+        try:
+            codes[i] = val_map[nan if isnan(v) else v]
+        except (KeyError, TypeError):
+            raise ValueError("Dosages must either be 0,1,2, or nan.")
+    return bytes(codes)
+
+
+def _pack_codes(codes: bytes) -> bytes:
+    """
+    Packs 2-bit codes, stored one per byte, four to a byte with the first code in the most significant bits
+
+    Args:
+        codes (bytes): Codes to pack. Each must be between 0 and 3
+
+    Returns:
+        bytes: Packed codes, padded with zero bits to a whole number of bytes
+    """
+    n_bytes = ceil(len(codes) / 4)
+    codes = codes + bytes(n_bytes * 4 - len(codes))
+    packed = int.from_bytes(codes[3::4])
+    for offset, shift_table in enumerate(_SHIFT_TABLES):
+        packed |= int.from_bytes(codes[offset::4].translate(shift_table))
+    return packed.to_bytes(n_bytes)
+
+
+def _pack_matrix(matrix, recordsize: int, missing: int = -1) -> bytes:
+    """
+    Packs a NumPy dosage matrix into consecutive SNP records
+
+    Args:
+        matrix (numpy.ndarray): Dosage matrix of shape (number of SNPs, number of individuals)
+        recordsize (int): Size of an individual SNP record in bytes
+        missing (int): Value marking missing dosages. nan is also treated as missing for floating point matrices
+
+    Returns:
+        bytes: Packed records, "recordsize" bytes per SNP
+    """
+    matrix = np.asarray(matrix)
+    is_missing = matrix == missing
+    if matrix.dtype.kind == "f":
+        is_missing |= np.isnan(matrix)
+    if not np.isin(matrix[~is_missing], (0, 1, 2)).all():
+        raise ValueError("Dosages must either be 0,1,2, or missing.")
+    n_snp, n_ind = matrix.shape
+    n_bytes = ceil(n_ind / 4)
+    codes = np.zeros((n_snp, n_bytes * 4), dtype=np.uint8)
+    codes[:, :n_ind] = np.where(is_missing, 3, matrix)
+    codes = codes.reshape(n_snp, n_bytes, 4)
+    records = np.zeros((n_snp, recordsize), dtype=np.uint8)
+    records[:, :n_bytes] = ((codes[:, :, 0] << 6) | (codes[:, :, 1] << 4) |
+                            (codes[:, :, 2] << 2) | codes[:, :, 3])
+    return records.tobytes()
 
 
 class PackedAncestryMapWriter:
@@ -14,15 +148,34 @@ class PackedAncestryMapWriter:
     Attributes:
         _nind (int): Number of individuals based on provided Ind_Info object
         _nsnp (int): Number of variants based on provided SNP_Info object
-        _trailingbytes (int): Number of null bytes to write after record
+        _nvalues (int): Number of dosages per record. The number of individuals, or of SNPs for a transposed file
+        _recordsize (int): Size of individual SNP record in bytes
+        _trailingbytes (bytes): Null bytes to write after record
         _isclosed (bool): Boolean indicating if file is closed
         _recordsleft (int): Number of records left to write
+        _nrecords (int): Number of records expected in the file, excluding the header record
+        _compressor (_BlockCompressor | None): Compresses records into blocks. None if the file is not compressed
+        _geno_file (str): Location of the ".geno" file
+        _progress (IO[bytes] | None): Progress map of a preallocated file, one byte per record set to 1 once the record is written. None if the file is not preallocated
+        _owner (bool): True if this object created the file. Only the owner of a preallocated file checks it on close
+        _lock (threading.Lock): Serializes positional writes on platforms without os.pwrite
+        _instr (_Instrumentation | None): Counters and phase timings. None if instrumentation is disabled
+        _HEADER_FORMAT (str): Format of the header record, filled with the numbers of individuals and SNPs and their hashes
+        _TRANSPOSED (bool): True if records hold the dosages of an individual rather than of a SNP
     """
+    _HEADER_FORMAT = "GENO   %i %i %x %x"
+    _TRANSPOSED = False
+
     def __init__(self, snp_obj: SNP_Info, ind_obj: Ind_Info,
                  geno_file: (str | None) = None, ind_file: (str | None) = None,
                  snp_file: (str | None) = None,
                  file_prefix: (str | None) = None, write_snp: bool = True,
-                 write_ind: bool = True, write_header: bool = True) -> None:
+                 write_ind: bool = True, write_header: bool = True,
+                 instrument: bool = False,
+                 hooks: (list[Callable] | None) = None,
+                 compression: (str | None) = None,
+                 compression_level: (int | None) = None,
+                 block_records: int = 4096, preallocate: bool = False) -> None:
         """
         Initialization method for PackedAncestryMapWriter object.
 
@@ -36,17 +189,44 @@ class PackedAncestryMapWriter:
             write_snp (boolean): writes variant file if True
             write_ind (boolean): writes individual file if True
             write_header (boolean): writes PackedAncestryMap header if True
+            instrument (bool): If True bytes written, records encoded and wall time per phase are recorded and available through "stats"
+            hooks (list, optional): Callables called as hook(name, value) on every instrumentation update. Only used if "instrument" is True
+            compression (str, optional): Either "zlib" or "lzma" to write a block-compressed ".geno" container, which PackedAncestryMap reads transparently. Requires "write_header"
+            compression_level (int, optional): Compression level, or preset for "lzma". Defaults to the codec's default
+            block_records (int): Number of records compressed together. Smaller blocks make random access cheaper, larger blocks compress better
+            preallocate (bool): If True the whole file is allocated up front and records are written in any order with "write_record_at" and "write_block_at", possibly from several threads, or from several processes the writer is passed to, each owning a disjoint range of records. Written records are tracked in a "<geno_file>.progress" sidecar file, which is checked and removed on close. Requires "write_header" and cannot be combined with "compression"
         """
+        self._instr = _Instrumentation(hooks) if instrument else None
         # generate useful metadata
+        start = perf_counter()
         self._nind = len(ind_obj)
         self._nsnp = len(snp_obj)
-        header = ("GENO   %i %i %x %x" % (self._nind, self._nsnp,
-                                          ind_obj._hash, snp_obj._hash)).encode()
-        min_byte_per_record = ceil(self._nind / 4)
+        header = (self._HEADER_FORMAT % (self._nind, self._nsnp,
+                                         ind_obj._hash, snp_obj._hash)).encode()
+        if self._TRANSPOSED:
+            self._nvalues, n_records = self._nsnp, self._nind
+        else:
+            self._nvalues, n_records = self._nind, self._nsnp
+        min_byte_per_record = ceil(self._nvalues / 4)
         recordsize = max(min_byte_per_record, len(header))
+        self._recordsize = recordsize
         self._trailingbytes = bytes(recordsize - min_byte_per_record)
         self._isclosed = False
-        self._recordsleft = self._nsnp
+        self._recordsleft = n_records
+        self._nrecords = n_records
+        self._compressor = None
+        self._progress = None
+        self._owner = True
+        self._lock = threading.Lock()
+        if preallocate and (compression is not None or not write_header):
+            raise ValueError("Preallocated .geno files require a header and cannot be compressed.")
+        if compression is not None:
+            if not write_header:
+                raise ValueError("Compressed .geno files require a header.")
+            self._compressor = _BlockCompressor(compression, compression_level,
+                                                block_records, recordsize)
+        if self._instr is not None:
+            self._instr.add_time("hash", perf_counter() - start)
 
         # write the snp and ind files and the header for the PACKEDANCESTRYMAP
         # parameter handling to allow for init polymorphism
@@ -64,50 +244,329 @@ class PackedAncestryMapWriter:
                 ind_file = file_prefix + ".ind"
                 snp_file = file_prefix + ".snp"
 
-        self._fgeno = open(geno_file, "wb+")
+        self._geno_file = geno_file
+        self._fgeno = open(geno_file, "wb+", buffering=_BUFFER_SIZE)
 
+        start = perf_counter()
         if write_snp:
             snp_obj.write(snp_file)
         if write_ind:
             ind_obj.write(ind_file)
+        if self._instr is not None:
+            self._instr.add_time("metadata", perf_counter() - start)
         # write header
         if write_header:
-            self._fgeno.write(header)
-            self._fgeno.write(bytes(recordsize - len(header)))
+            start = perf_counter()
+            if self._compressor is not None:
+                self._write_raw(self._compressor.preamble(n_records))
+            self._write_raw(header + bytes(recordsize - len(header)))
+            if self._instr is not None:
+                self._instr.add_time("header", perf_counter() - start)
+        if preallocate:
+            self._fgeno.flush()
+            os.ftruncate(self._fgeno.fileno(), (1 + n_records) * recordsize)
+            self._progress = open(geno_file + PROGRESS_SUFFIX, "wb+", buffering=0)
+            self._progress.truncate(n_records)
+
+    def __getstate__(self) -> dict:
+        """
+        Allows preallocated writers to be sent to other processes, which reopen the file and write their own records
+
+        Returns:
+            dict: Attributes of the writer, without open files
+        """
+        if self._progress is None:
+            raise TypeError("Only preallocated PackedAncestryMapWriter objects can be shared with other processes.")
+        state = self.__dict__.copy()
+        state.update(_fgeno=None, _progress=None, _lock=None, _instr=None, _owner=False)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Reopens the ".geno" and progress files of a preallocated writer
+
+        Args:
+            state (dict): Attributes of the writer, see "__getstate__"
+        """
+        self.__dict__.update(state)
+        self._fgeno = open(self._geno_file, "r+b", buffering=0)
+        self._progress = open(self._geno_file + PROGRESS_SUFFIX, "r+b", buffering=0)
+        self._lock = threading.Lock()
+
+    def _write(self, data: bytes) -> None:
+        """
+        Writes records to the ".geno" file, compressing them first if the file is compressed
+
+        Args:
+            data (bytes): Packed records
+        """
+        if self._progress is not None:
+            raise ValueError("Preallocated PackedAncestryMapWriter objects only accept \"write_record_at\" and \"write_block_at\".")
+        if self._compressor is not None:
+            data = self._compressor.add(data)
+        self._write_raw(data)
+
+    def _write_raw(self, data: bytes) -> None:
+        """
+        Writes bytes to the ".geno" file, recording their size and the time spent writing if instrumentation is enabled
+
+        Args:
+            data (bytes): Bytes to write
+        """
+        if self._instr is None:
+            self._fgeno.write(data)
+            return
+        start = perf_counter()
+        self._fgeno.write(data)
+        self._instr.add_time("flush", perf_counter() - start)
+        self._instr.count("bytes_written", len(data))
+
+    def _add_encoded(self, start: float, n_records: int) -> None:
+        """
+        Records the time spent encoding SNP records
+
+        Args:
+            start (float): Value of time.perf_counter() when encoding started
+            n_records (int): Number of records encoded
+        """
+        if self._instr is not None:
+            self._instr.add_time("encode", perf_counter() - start)
+            self._instr.count("records_encoded", n_records)
+
+    def _encode_record(self, dosage_list) -> bytes:
+        """
+        Packs a list of dosages into a full SNP record, including trailing bytes
+
+        Args:
+            dosage_list (list | bytes): List of allelic dosages, see "write_record"
+
+        Returns:
+            bytes: Packed SNP record
+        """
+        if len(dosage_list) != self._nvalues:
+            raise ValueError("Length of record should be equal to %i, the number of %s in the dataset." %
+                             (self._nvalues, "SNPs" if self._TRANSPOSED else "individuals"))
+        return _pack_codes(_dosage_codes(dosage_list)) + self._trailingbytes
 
     def write_record(self, dosage_list: list[Literal[0, 1, 2, nan]]) -> None:
         """
         Writes SNP record to PackedAncestryMap
 
         Args:
-            dosage_list (list): List of allelic dosages. Length of list must be equal to the number of individuals.
+            dosage_list (list): List of allelic dosages. Length of list must be equal to the number of individuals. A bytes-like object holding one code per individual (0, 1, 2, or 3 for missing) is also accepted
+        """
+        if self._instr is None:
+            record = self._encode_record(dosage_list)
+        else:
+            start = perf_counter()
+            record = self._encode_record(dosage_list)
+            self._add_encoded(start, 1)
+        if self._isclosed:
+            raise ValueError("PackedAncestryMapWriter object is closed.")
+        self._write(record)
+        self._recordsleft -= 1
+
+    def write_records(self, batch) -> None:
+        """
+        Writes a batch of SNP records to PackedAncestryMap with a single write
+
+        Args:
+            batch (iterable): Iterable of dosage lists, each accepted by "write_record"
         """
-        shift_by = 6
-        record = 0
-        # check length
-        if len(dosage_list) != self._nind:
-            raise ValueError("Length of record should be equal to %i, the number of individuals in the dataset." % self._nind)
+        start = perf_counter() if self._instr is not None else 0.0
+        records = [self._encode_record(dosage_list) for dosage_list in batch]
+        self._add_encoded(start, len(records))
+        if self._isclosed:
+            raise ValueError("PackedAncestryMapWriter object is closed.")
+        self._write(b"".join(records))
+        self._recordsleft -= len(records)
+
+    def write_block(self, matrix, missing: int = -1) -> None:
+        """
+        Writes a block of consecutive SNP records to PackedAncestryMap. NumPy matrices are packed with vectorized operations
+
+        Args:
+            matrix (numpy.ndarray | list): Dosage matrix with one row per SNP and one column per individual
+            missing (int): Value marking missing dosages in a NumPy matrix. nan is also treated as missing for floating point matrices
+        """
+        if np is None or not isinstance(matrix, np.ndarray):
+            self.write_records(matrix)
+            return
+        if matrix.ndim != 2 or matrix.shape[1] != self._nvalues:
+            raise ValueError("Matrix should have %i columns, the number of %s in the dataset." %
+                             (self._nvalues, "SNPs" if self._TRANSPOSED else "individuals"))
         elif self._isclosed:
             raise ValueError("PackedAncestryMapWriter object is closed.")
-        for v in dosage_list:
-            v = nan if isnan(v) else v  # use proper nan instance
+        start = perf_counter() if self._instr is not None else 0.0
+        records = _pack_matrix(matrix, self._recordsize, missing)
+        self._add_encoded(start, matrix.shape[0])
+        self._write(records)
+        self._recordsleft -= matrix.shape[0]
+
+    def _write_packed(self, records: bytes, n_records: int) -> None:
+        """
+        Writes SNP records that are already packed and padded to the record size of this file
+
+        Args:
+            records (bytes): Packed records
+            n_records (int): Number of records in "records"
+        """
+        if self._isclosed:
+            raise ValueError("PackedAncestryMapWriter object is closed.")
+        self._write(records)
+        self._recordsleft -= n_records
+
+    def _write_span_at(self, data: bytes, offset: int) -> None:
+        """
+        Writes bytes at a given offset of a preallocated file without marking any record as written. Used to fill records piece by piece
+
+        Args:
+            data (bytes): Bytes to write
+            offset (int): Byte offset in the ".geno" file
+        """
+        if self._isclosed:
+            raise ValueError("PackedAncestryMapWriter object is closed.")
+        if self._progress is None:
+            raise ValueError("Positional writes require a preallocated PackedAncestryMapWriter.")
+        write_start = perf_counter() if self._instr is not None else 0.0
+        # without os.pwrite positional writes seek the shared file object
+        with self._lock if not hasattr(os, "pwrite") else nullcontext():
+            _write_at(self._fgeno, data, offset)
+        if self._instr is not None:
+            self._instr.add_time("flush", perf_counter() - write_start)
+            self._instr.count("bytes_written", len(data))
+
+    def _mark_written(self, start: int, n_records: int) -> None:
+        """
+        Marks records of a preallocated file as written in the progress map. Records must only be marked once fully written
+
+        Args:
+            start (int): Index of the first record
+            n_records (int): Number of records
+        """
+        if not (0 <= start and start + n_records <= self._nrecords):
+            raise IndexError("Record range [%i, %i) out of bounds" % (start, start + n_records))
+        with self._lock if not hasattr(os, "pwrite") else nullcontext():
+            _write_at(self._progress, b"\x01" * n_records, start)
+
+    def _write_records_at(self, records: bytes, start: int, n_records: int) -> None:
+        """
+        Writes packed records at their place in a preallocated file and marks them as written
+
+        Args:
+            records (bytes): Packed records
+            start (int): Index of the first record
+            n_records (int): Number of records in "records"
+        """
+        if not (0 <= start and start + n_records <= self._nrecords):
+            raise IndexError("Record range [%i, %i) out of bounds" % (start, start + n_records))
+        self._write_span_at(records, (1 + start) * self._recordsize)
+        self._mark_written(start, n_records)
+
+    def write_record_at(self, i_record: int, dosage_list: list[Literal[0, 1, 2, nan]]) -> None:
+        """
+        Writes a record at a given index of a preallocated PackedAncestryMap
+
+        Args:
+            i_record (int): Index of the record, i.e. of the SNP, or of the individual for a transposed file
+            dosage_list (list): List of allelic dosages, see "write_record"
+        """
+        start = perf_counter() if self._instr is not None else 0.0
+        record = self._encode_record(dosage_list)
+        self._add_encoded(start, 1)
+        self._write_records_at(record, i_record, 1)
+
+    def write_block_at(self, start: int, matrix, missing: int = -1) -> None:
+        """
+        Writes a block of consecutive records starting at a given index of a preallocated PackedAncestryMap. NumPy matrices are packed with vectorized operations
+
+        Args:
+            start (int): Index of the first record
+            matrix (numpy.ndarray | list): Dosage matrix with one row per record
+            missing (int): Value marking missing dosages in a NumPy matrix. nan is also treated as missing for floating point matrices
+        """
+        encode_start = perf_counter() if self._instr is not None else 0.0
+        if np is None or not isinstance(matrix, np.ndarray):
+            records = [self._encode_record(dosage_list) for dosage_list in matrix]
+            n_records = len(records)
+            records = b"".join(records)
+        else:
+            if matrix.ndim != 2 or matrix.shape[1] != self._nvalues:
+                raise ValueError("Matrix should have %i columns, the number of %s in the dataset." %
+                                 (self._nvalues, "SNPs" if self._TRANSPOSED else "individuals"))
+            n_records = matrix.shape[0]
+            records = _pack_matrix(matrix, self._recordsize, missing)
+        self._add_encoded(encode_start, n_records)
+        self._write_records_at(records, start, n_records)
+
+    def _check_preallocated(self) -> None:
+        """
+        Checks that every record of a preallocated file was written. The progress file is removed if so, and kept otherwise so that missing records can be identified
+        """
+        expected_size = (1 + self._nrecords) * self._recordsize
+        if os.path.getsize(self._geno_file) != expected_size:
+            warnings.warn("Size of \"%s\" is %i bytes instead of %i bytes. File may be corrupt." %
+                          (self._geno_file, os.path.getsize(self._geno_file), expected_size))
+        self._progress.seek(0)
+        missing = _missing_runs(self._progress.read())
+        self._progress.close()
+        if missing:
+            shown = ", ".join("[%i, %i)" % run for run in missing[:10])
+            warnings.warn("%i records were never written: %s%s. File may be corrupt." %
+                          (sum(stop - start for start, stop in missing), shown,
+                           ", ..." if len(missing) > 10 else ""))
+        else:
+            os.remove(self._geno_file + PROGRESS_SUFFIX)
+
+    def _copy_packed(self, src: IO[bytes], offset: int, n_records: int) -> None:
+        """
+        Copies SNP records that are already packed and padded to the record size of this file straight from another file.
+        Uses os.copy_file_range where available, falling back to large buffered copies.
+
+        Args:
+            src (IO[bytes]): Binary file object to copy from. Its position is not preserved
+            offset (int): Byte offset of the first record in "src"
+            n_records (int): Number of records to copy
+        """
+        if self._isclosed:
+            raise ValueError("PackedAncestryMapWriter object is closed.")
+        size = n_records * self._recordsize
+        copied = 0
+        if self._compressor is not None:
+            src.seek(offset)
+            while copied < size:
+                chunk = src.read(min(_BUFFER_SIZE, size - copied))
+                if not chunk:
+                    raise ValueError("File \"%s\" ended before all records were copied." % src.name)
+                self._write(chunk)
+                copied += len(chunk)
+            self._recordsleft -= n_records
+            return
+        start = perf_counter()
+        self._fgeno.flush()
+        if hasattr(os, "copy_file_range"):
             try:
-                val_map[v]
-            except KeyError:
-                raise ValueError("Dosages must either be 0,1,2, or nan.")
-            if (shift_by == 0):
-                record = record + (val_map[v] << shift_by)
-                self._fgeno.write(bytes([record]))
-                record = 0
-                shift_by = 6
-                continue
-            record = record + (val_map[v] << shift_by)
-            shift_by -= 2
-        if shift_by != 6:
-            self._fgeno.write(bytes([record]))
-        # write trailing bytes
-        self._fgeno.write(bytes(self._trailingbytes))
-        self._recordsleft -= 1
+                while copied < size:
+                    n_copied = os.copy_file_range(src.fileno(), self._fgeno.fileno(),
+                                                  size - copied, offset + copied)
+                    if n_copied == 0:
+                        break
+                    copied += n_copied
+            except OSError:
+                pass
+        # resynchronize the buffered file object with the file descriptor
+        self._fgeno.seek(0, os.SEEK_END)
+        src.seek(offset + copied)
+        while copied < size:
+            chunk = src.read(min(_BUFFER_SIZE, size - copied))
+            if not chunk:
+                raise ValueError("File \"%s\" ended before all records were copied." % src.name)
+            self._fgeno.write(chunk)
+            copied += len(chunk)
+        if self._instr is not None:
+            self._instr.add_time("flush", perf_counter() - start)
+            self._instr.count("bytes_written", size)
+        self._recordsleft -= n_records
 
     def close(self) -> None:
         """
@@ -116,7 +575,32 @@ class PackedAncestryMapWriter:
         if self._isclosed:
             return None
         else:
-            if self._recordsleft != 0:
+            if self._progress is None and self._recordsleft != 0:
                 warnings.warn("Incomplete number of records written. File may be corrupt.")
+            start = perf_counter()
+            if self._compressor is not None:
+                self._write_raw(self._compressor.finish())
+                # fill in the number of records and the offset of the block index
+                self._fgeno.seek(0)
+                self._write_raw(self._compressor.preamble(self._nrecords - self._recordsleft,
+                                                          self._compressor.offsets[-1]))
             self._fgeno.close()
+            if self._instr is not None:
+                self._instr.add_time("flush", perf_counter() - start)
+            if self._progress is not None:
+                if self._owner:
+                    self._check_preallocated()
+                else:
+                    self._progress.close()
             self._isclosed = True
+
+    def stats(self) -> (dict | None):
+        """
+        Gets instrumentation counters and cumulative wall time per phase
+
+        Returns:
+            dict | None: Counters ("bytes_written", "records_encoded", ...) and phase times ("hash_seconds", "encode_seconds", "flush_seconds", ...). None if instrumentation is disabled
+        """
+        if self._instr is None:
+            return None
+        return self._instr.snapshot()